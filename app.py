@@ -1,30 +1,49 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from google.cloud import storage
 import os
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from PyPDF2 import PdfReader
 import docx
 import pptx
+import shared
+from shared import model, knowledge_base, passage_store
+from query_batcher import QueryBatcher
+from query_cache import QueryCache
+from passages import PASSAGE_OVERFETCH, PASSAGE_SCORING, aggregate_hits
+from lexical import SEARCH_MODE, rrf_fuse
+from doc_meta import filter_key
+import query_args
+import metrics
 
 # Initialize Flask application
 app = Flask(__name__)
-
-# Initialize AI search model and FAISS index
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-faiss_index_path = "ai_search_index.faiss"  # FAISS index file path
-metadata_path = "ai_metadata.npy"  # Metadata file path (stores file paths)
-
-try:
-    index = faiss.read_index(faiss_index_path)
-    file_paths = np.load(metadata_path, allow_pickle=True).tolist()  # Convert NumPy array to list
-    print(f"✅ FAISS index and metadata loaded! ({len(file_paths)} files)")
-except Exception as e:
-    print(f"❌ Error loading FAISS index or metadata: {e}")
-    index = None
-    file_paths = []
+metrics.track_requests(app)
+
+# Search over the shared index, doc table and text store (no per-query file parsing)
+SNIPPET_CHARS = 1000
+
+shared.start_serving()
+if shared.snapshots.current is not None:
+    print(f"✅ FAISS index and text store loaded! ({len(shared.snapshots.current)} files)")
+else:
+    print("❌ Error loading FAISS index: no index matching the doc table on disk")
+
+# 🚦 Concurrent /search calls share one encode + passage index.search
+query_cache = QueryCache()
+encode = query_cache.cached_encoder(lambda queries: model.encode(queries, convert_to_numpy=True))
+query_batcher = QueryBatcher(encode, lambda snap: snap.index, plan=lambda snap, options: snap.search_plan(*options))
+
+# 🚦 Readiness probe: persisted index mapped + encoder warmed up
+@app.route('/ready', methods=['GET'])
+def ready():
+    snap = shared.snapshots.current
+    body = {"ready": shared.ready.is_set(), "index": snap is not None, "encoder": shared.model.loaded,
+            "startup_s": shared.startup}
+    return jsonify(body), 200 if body["ready"] else 503
+
+# 📊 Prometheus scrape endpoint (per worker)
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
 
 # Route for homepage (testing)
 @app.route('/')
@@ -34,14 +53,15 @@ def home():
 # 📌 Debug Route: Check if FAISS index is loaded
 @app.route('/debug_index', methods=['GET'])
 def debug_index():
-    if index is None:
+    if shared.snapshots.current is None:
         return jsonify({"error": "FAISS index is not loaded!"}), 500
-    return jsonify({"status": "FAISS index is loaded", "total_files": len(file_paths)})
+    return jsonify({"status": "FAISS index is loaded", "total_files": len(knowledge_base), "passages": len(passage_store),
+                    "index": shared.snapshots.params(), "snapshots": shared.snapshots.stats()})
 
-# 📌 Debug Route: List all indexed files (Fix: Convert ndarray to list)
+# 📌 Debug Route: List all indexed files
 @app.route('/list_files', methods=['GET'])
 def list_files():
-    return jsonify({"indexed_files": list(file_paths)})  # Convert to list for JSON serialization
+    return jsonify({"indexed_files": list(knowledge_base)})
 
 # 📌 Upload file route (Google Cloud Storage)
 @app.route('/upload', methods=['POST'])
@@ -91,46 +111,85 @@ def test_text_extraction():
     extracted_text = extract_text_from_file(file_path)
     return jsonify({"file_path": file_path, "extracted_text": extracted_text[:1000]})
 
-# 📌 AI-powered search function with text extraction
-def salesbot_search(query, top_k=5, file_type=None):
-    if index is None:
-        return [{"error": "FAISS index not loaded"}]
-
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_embedding, top_k)
+# 📌 AI-powered search served from the stored text (query-aware snippet optional)
+def salesbot_search(query, top_k=5, file_type=None, snippet="preview", nprobe=None, ef_search=None,
+                    scoring=PASSAGE_SCORING, mode=SEARCH_MODE, category=None, folder=None,
+                    modified_after=None, modified_before=None):
+    # The whole search reads one snapshot, so a concurrent index update can't mix versions
+    shared.refresh_snapshot()
+    with shared.snapshots.reading() as snap:
+        if snap is None:
+            return [{"error": "FAISS index not loaded"}]
+        return _search_snapshot(snap, query, top_k, file_type, snippet, nprobe, ef_search, scoring, mode,
+                                category, folder, modified_after, modified_before)
+
+def _search_snapshot(snap, query, top_k, file_type, snippet, nprobe, ef_search, scoring, mode,
+                     category, folder, modified_after, modified_before):
+    # Filters run inside the search (FAISS IDSelector / BM25 mask), so k filtered docs cost ~one unfiltered query
+    filters = filter_key(file_type, category, folder, modified_after, modified_before)
+    if filters and snap.filter_selector(filters) is None:
+        return []
+
+    dense = []
+    if mode != "lexical":
+        options = (nprobe, ef_search, filters) if nprobe or ef_search or filters else None
+        distances, indices = query_batcher.search(query, top_k * PASSAGE_OVERFETCH, options=options, source=snap)
+        dense = aggregate_hits(distances, indices, len(indices), scoring)
+    best_passage = {doc_id: pid for doc_id, _, pid in dense}
+    if mode == "dense":
+        ranked = [(doc_id, score) for doc_id, score, _ in dense]
+    else:
+        # BM25 never touches the model; hybrid fuses both rankings by reciprocal rank
+        allowed = snap.meta.mask(dict(filters)) if filters else None
+        lexical = snap.lexical.search(query, top_k * PASSAGE_OVERFETCH, allowed)
+        ranked = lexical if mode == "lexical" else rrf_fuse([[d for d, _, _ in dense], [d for d, _ in lexical]])
 
     results = []
-    for i, idx in enumerate(indices[0]):
-        if idx < len(file_paths):
-            file_path = file_paths[idx]
-            file_name = os.path.basename(file_path)
-            drive_link = f"https://drive.google.com/open?id={file_name}"
-
-            if file_type and not file_path.lower().endswith(file_type.lower()):
-                continue
-
-            extracted_text = extract_text_from_file(file_path)
-
-            results.append({
-                "file_name": file_name,
-                "file_path": file_path,
-                "google_drive_link": drive_link,
-                "relevance_score": float(distances[0][i]),  # Convert float32 → float
-                "document_text": extracted_text[:1000]  # Limit text for response
-            })
-    
+    for (doc_id, score), doc in zip(ranked, snap.docs.lookup([doc_id for doc_id, _ in ranked])):
+        if doc is None:
+            continue
+        file_path = doc["name"]
+        file_name = os.path.basename(file_path)
+        drive_link = f"https://drive.google.com/open?id={file_name}"
+
+        span = snap.passages.span(best_passage[doc_id]) if snippet == "query" and doc_id in best_passage else None
+        if span is not None:
+            document_text = snap.texts.slice(doc["id"], *span)
+        else:
+            document_text = snap.texts.text(doc["id"], limit=SNIPPET_CHARS * 4)[:SNIPPET_CHARS]
+
+        results.append({
+            "file_name": file_name,
+            "file_path": file_path,
+            "google_drive_link": drive_link,
+            "relevance_score": round(score, 4),  # Passage cosine (dense), BM25 (lexical) or RRF (hybrid)
+            "document_text": document_text
+        })
+        if len(results) == top_k:
+            break
+
     return results
 
-# 📌 AI Search Endpoint with optional file type filtering
+# 📌 AI Search Endpoint with optional file type / category / folder / modified-date filtering
 @app.route('/search', methods=['GET'])
 def search():
     query = request.args.get('query')
     file_type = request.args.get('file_type')  # Optional file type filter
+    snippet = request.args.get('snippet', 'preview')  # "query" returns the best-matching passage
+    filters = {name: request.args.get(name) for name in ("category", "folder", "modified_after", "modified_before")}
 
     if not query:
         return jsonify({"error": "No query provided"}), 400
-
-    results = salesbot_search(query, file_type=file_type)
+    try:
+        scoring = query_args.scoring(request.args)  # "max" or "sum" over a document's passage hits
+        mode = query_args.mode(request.args)  # "dense", "lexical" (BM25) or "hybrid"
+        # nprobe: IVF lists probed, ef_search: HNSW beam width; both trade latency for recall
+        nprobe, ef_search = query_args.search_options(request.args) or (None, None)
+        query_args.filters(request.args)  # rejects unparseable modified_after / modified_before
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    results = salesbot_search(query, file_type=file_type, snippet=snippet, nprobe=nprobe, ef_search=ef_search, scoring=scoring, mode=mode, **filters)
     return jsonify(results)
 
 if __name__ == '__main__':
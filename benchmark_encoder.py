@@ -0,0 +1,62 @@
+# ✅ benchmark_encoder.py – Export, Parity Check + Per-Core Throughput for the Encoder Backends
+# Usage: python benchmark_encoder.py [export]
+import os
+import sys
+import time
+from encoder import (
+    ENCODER_MODEL, ENCODER_PARITY_THRESHOLD, OnnxEncoder, export_onnx, onnx_model_path, parity
+)
+from doc_table import DocTable
+from kb_store import KnowledgeStore
+from passages import iter_passages
+
+SAMPLE_SIZE = int(os.getenv("BENCH_SAMPLE_SIZE", 512))
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", 32))
+
+# 📚 Real passages from the knowledge base when there is one, synthetic sentences otherwise
+def sample_texts(limit=SAMPLE_SIZE):
+    texts = []
+    if os.path.exists("doc_table.npy"):
+        store = KnowledgeStore(DocTable())
+        for name in store:
+            texts.extend(chunk for _, _, chunk in iter_passages(store[name]))
+            if len(texts) >= limit:
+                break
+    while len(texts) < limit:
+        i = len(texts)
+        texts.append(f"Sample sales deck {i}: positioning, pricing and audience insights for client segment {i % 17}.")
+    return texts[:limit]
+
+def throughput(encoder, texts):
+    encoder.encode(texts[:BATCH_SIZE], batch_size=BATCH_SIZE)  # warm-up
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=BATCH_SIZE)
+    return len(texts) / (time.perf_counter() - start)
+
+def torch_encoder(threads):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(threads)
+    return SentenceTransformer(ENCODER_MODEL)
+
+if __name__ == "__main__":
+    if "export" in sys.argv[1:] or not os.path.exists(onnx_model_path):
+        print(f"📤 Exporting {ENCODER_MODEL} → {onnx_model_path} (int8)...")
+        export_onnx()
+
+    texts = sample_texts()
+    cores = os.cpu_count() or 1
+    print(f"🧪 {len(texts)} texts, batch size {BATCH_SIZE}, {cores} cores\n")
+
+    reference, candidate = torch_encoder(cores), OnnxEncoder(threads=cores)
+    check = parity(reference, candidate, texts)
+    status = "✅" if check["passed"] else "❌"
+    print(f"{status} Parity: min cosine {check['min_cosine']}, mean {check['mean_cosine']} (threshold {ENCODER_PARITY_THRESHOLD})\n")
+
+    print(f"{'backend':<12}{'threads':>8}{'texts/s':>12}{'texts/s/core':>15}")
+    for threads in sorted({1, cores}):
+        for name, encoder in (("torch", torch_encoder(threads)), ("onnx-int8", OnnxEncoder(threads=threads))):
+            rate = throughput(encoder, texts)
+            print(f"{name:<12}{threads:>8}{rate:>12.1f}{rate / threads:>15.1f}")
+
+    sys.exit(0 if check["passed"] else 1)
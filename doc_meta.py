@@ -0,0 +1,121 @@
+# ✅ doc_meta.py – Columnar Doc Metadata (type, category, Drive folder, modified time)
+import os
+from datetime import datetime
+import numpy as np
+
+doc_meta_path = "doc_meta.npz"
+CODED_COLUMNS = ("ext", "category", "folder")
+
+def parse_time(value, strict=False):
+    # Drive RFC 3339 timestamps / ISO dates → epoch seconds (0 = unknown; `strict` raises instead)
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        if strict:
+            raise
+        return 0
+
+# 🔑 Hashable filter key from request-style arguments; None when unfiltered
+def filter_key(file_type=None, category=None, folder=None, modified_after=None, modified_before=None):
+    if file_type:
+        file_type = file_type.lower()
+        file_type = file_type if file_type.startswith(".") else f".{file_type}"
+    pairs = (("ext", file_type), ("category", category), ("folder", folder),
+             ("modified_after", modified_after), ("modified_before", modified_before))
+    return tuple((k, v) for k, v in pairs if v) or None
+
+# 🗂️ One array per column, indexed by doc id; strings are dictionary-coded (-1 = no row)
+class DocMeta:
+    def __init__(self, path=doc_meta_path):
+        self.path = path
+        self.values = {col: [] for col in CODED_COLUMNS}
+        self.codes = {col: np.zeros(0, dtype="int32") for col in CODED_COLUMNS}
+        self.modified = np.zeros(0, dtype="int64")
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as f:
+                for col in CODED_COLUMNS:
+                    self.values[col] = f[f"{col}_values"].tolist()
+                    self.codes[col] = f[f"{col}_codes"]
+                self.modified = f["modified"]
+        except Exception:
+            self.values = {col: [] for col in CODED_COLUMNS}
+            self.codes = {col: np.zeros(0, dtype="int32") for col in CODED_COLUMNS}
+            self.modified = np.zeros(0, dtype="int64")
+
+    def save(self):
+        tmp_path = self.path + ".tmp.npz"
+        columns = {f"{col}_values": np.array(self.values[col], dtype=str) for col in CODED_COLUMNS}
+        columns.update({f"{col}_codes": self.codes[col] for col in CODED_COLUMNS})
+        np.savez(tmp_path, modified=self.modified, **columns)
+        os.replace(tmp_path, self.path)
+
+    def _grow(self, size):
+        extra = size - len(self.modified)
+        if extra > 0:
+            for col in CODED_COLUMNS:
+                self.codes[col] = np.concatenate([self.codes[col], np.full(extra, -1, dtype="int32")])
+            self.modified = np.concatenate([self.modified, np.zeros(extra, dtype="int64")])
+
+    def _code(self, col, value):
+        values = self.values[col]
+        try:
+            return values.index(value)
+        except ValueError:
+            values.append(value)
+            return len(values) - 1
+
+    def has(self, doc_ids):
+        doc_ids = np.asarray(doc_ids, dtype="int64")
+        known = doc_ids < len(self.modified)
+        known[known] = self.codes["ext"][doc_ids[known]] >= 0
+        return known
+
+    # ✍️ `rows` is {doc_id: {"ext", "category", "folder", "modified"}}
+    def update(self, rows):
+        if not rows:
+            return
+        self._grow(max(rows) + 1)
+        for doc_id, row in rows.items():
+            for col in CODED_COLUMNS:
+                self.codes[col][doc_id] = self._code(col, row.get(col) or "")
+            self.modified[doc_id] = parse_time(row.get("modified"))
+
+    def clear(self, doc_ids):
+        doc_ids = np.asarray([d for d in doc_ids if d < len(self.modified)], dtype="int64")
+        for col in CODED_COLUMNS:
+            self.codes[col][doc_ids] = -1
+        self.modified[doc_ids] = 0
+
+    # 🔎 Boolean mask over doc ids; equality on coded columns, range on modified time
+    def mask(self, filters):
+        mask = self.codes["ext"] >= 0
+        for col in CODED_COLUMNS:
+            wanted = filters.get(col)
+            if wanted is None:
+                continue
+            codes = [i for i, v in enumerate(self.values[col]) if v.lower() == wanted.lower()]
+            mask &= np.isin(self.codes[col], codes)
+        if filters.get("modified_after"):
+            mask &= self.modified >= parse_time(filters["modified_after"])
+        if filters.get("modified_before"):
+            mask &= (self.modified > 0) & (self.modified < parse_time(filters["modified_before"]))
+        return mask
+
+    def select(self, filters):
+        return np.flatnonzero(self.mask(filters))
+
+    def row(self, doc_id):
+        if doc_id >= len(self.modified) or self.codes["ext"][doc_id] < 0:
+            return {}
+        row = {col: self.values[col][self.codes[col][doc_id]] for col in CODED_COLUMNS}
+        row["modified"] = int(self.modified[doc_id]) or None
+        return row
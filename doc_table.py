@@ -0,0 +1,112 @@
+# ✅ doc_table.py – Array-Backed Doc Table (FAISS id → source, type, text offset)
+import os
+import numpy as np
+
+doc_table_path = "doc_table.npy"
+
+def _row_dtype(name_width):
+    return np.dtype([
+        ("name", f"U{max(name_width, 1)}"),
+        ("ext", "U16"),
+        ("hash", "U32"),
+        ("offset", "i8"),
+        ("length", "i8"),
+    ])
+
+# 📇 Row id == FAISS id; tombstoned rows have an empty name
+class DocTable:
+    def __init__(self, path=doc_table_path):
+        self.path = path
+        self.rows = np.zeros(0, dtype=_row_dtype(1))
+        self.ids = {}
+        self.load()
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                # Read-only mmap: workers share page cache until they write
+                rows = np.load(self.path, mmap_mode="r", allow_pickle=False)
+                if "offset" in rows.dtype.names:
+                    self.rows = rows
+            except Exception:
+                self.rows = np.zeros(0, dtype=_row_dtype(1))
+        self.ids = {str(n): i for i, n in enumerate(self.rows["name"]) if n}
+
+    def save(self):
+        tmp_path = self.path + ".tmp.npy"
+        np.save(tmp_path, self.rows, allow_pickle=False)
+        os.replace(tmp_path, self.path)
+
+    def get_id(self, name):
+        return self.ids.get(name)
+
+    def get_hash(self, name):
+        doc_id = self.ids.get(name)
+        return None if doc_id is None else str(self.rows["hash"][doc_id])
+
+    def span(self, doc_id):
+        row = self.rows[doc_id]
+        return int(row["offset"]), int(row["length"])
+
+    def _writable(self):
+        if isinstance(self.rows, np.memmap):
+            self.rows = np.array(self.rows)
+
+    def _widen(self, extra_rows, name_width):
+        width = max(self.rows.dtype["name"].itemsize // 4, name_width)
+        grown = np.zeros(len(self.rows) + extra_rows, dtype=_row_dtype(width))
+        grown[:len(self.rows)] = self.rows.astype(grown.dtype)
+        self.rows = grown
+
+    # ➕ Insert or refresh rows; names keep their id across calls
+    def assign(self, entries):
+        entries = list(entries)
+        self._writable()
+        new_names = list(dict.fromkeys(n for n, _, _, _ in entries if n not in self.ids))
+        width = max(map(len, (n for n, _, _, _ in entries)), default=1)
+        if new_names or width > self.rows.dtype["name"].itemsize // 4:
+            start = len(self.rows)
+            self._widen(len(new_names), width)
+            for offset, name in enumerate(new_names):
+                self.ids[name] = start + offset
+        ids = np.empty(len(entries), dtype="int64")
+        for i, (name, h, offset, length) in enumerate(entries):
+            doc_id = self.ids[name]
+            self.rows[doc_id] = (name, os.path.splitext(name)[-1].lower(), h, offset, length)
+            ids[i] = doc_id
+        return ids
+
+    def drop(self, names):
+        self._writable()
+        dropped = []
+        for name in names:
+            doc_id = self.ids.pop(name, None)
+            if doc_id is not None:
+                self.rows[doc_id] = ("", "", "", 0, 0)
+                dropped.append(doc_id)
+        return np.array(dropped, dtype="int64")
+
+    def live_ids(self):
+        return np.fromiter(self.ids.values(), dtype="int64", count=len(self.ids))
+
+    # 🔎 O(k) lookup of FAISS result ids; misses come back as None
+    def lookup(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        valid = (ids >= 0) & (ids < len(self.rows))
+        out = []
+        for doc_id, ok in zip(ids.tolist(), valid.tolist()):
+            row = self.rows[doc_id] if ok else None
+            out.append(None if row is None or not row["name"] else {
+                "id": doc_id,
+                "name": str(row["name"]),
+                "ext": str(row["ext"]),
+                "offset": int(row["offset"]),
+                "length": int(row["length"]),
+            })
+        return out
@@ -0,0 +1,76 @@
+# ✅ drive_batch.py – Batched Drive Moves, Deletes and Folder Probes
+from drive_sync import execute
+DRIVE_BATCH_LIMIT = 100  # Drive rejects batches larger than this
+
+# 📦 Queue mutations and send them as multipart batch requests, only when flush() is called
+class DriveBatcher:
+    def __init__(self, service, log, tree=None, batch_limit=DRIVE_BATCH_LIMIT):
+        self.service = service
+        self.log = log
+        self.tree = tree
+        self.batch_limit = batch_limit
+        self.pending = []
+        self.requests_sent = 0
+
+    def _queue(self, request, on_success, error_key, item):
+        self.pending.append((request, on_success, error_key, item))
+
+    def discard(self):
+        # Failed ingestion run: files whose text was never committed must stay where the next run finds them
+        dropped, self.pending = len(self.pending), []
+        return dropped
+
+    def flush(self):
+        while self.pending:
+            chunk, self.pending = self.pending[:self.batch_limit], self.pending[self.batch_limit:]
+
+            def callback(request_id, response, exception, chunk=chunk):
+                _, on_success, error_key, item = chunk[int(request_id)]
+                if exception is not None:
+                    self.log.setdefault(error_key, []).append(dict(item, error=str(exception)))
+                elif on_success is not None:
+                    on_success(response)
+
+            batch = self.service.new_batch_http_request(callback=callback)
+            for i, (request, _, _, _) in enumerate(chunk):
+                batch.add(request, request_id=str(i))
+            try:
+                execute(batch, "batch", retries=0)  # a partly applied batch isn't safe to resend whole
+            except Exception as e:
+                for _, _, error_key, item in chunk:
+                    self.log.setdefault(error_key, []).append(dict(item, error=str(e)))
+            self.requests_sent += 1
+
+    # 🚚 Reuses the parents already returned by the listing when we have them
+    def move(self, file, new_folder_id, move_log):
+        parents = file.get("parents")
+        if parents is None:
+            parents = execute(self.service.files().get(fileId=file["id"], fields="parents"), "files.get").get("parents", [])
+        if new_folder_id in parents and len(parents) == 1:
+            move_log.append(file["id"])
+            return
+        request = self.service.files().update(
+            fileId=file["id"],
+            addParents=new_folder_id,
+            removeParents=",".join(p for p in parents if p != new_folder_id),
+            fields="id, parents"
+        )
+
+        def moved(_):
+            move_log.append(file["id"])
+            if self.tree is not None:
+                self.tree.reparent(file["id"], [new_folder_id])
+
+        self._queue(request, moved, "move_errors", {"file_id": file["id"]})
+
+    def delete(self, file_id, name=None):
+        request = self.service.files().delete(fileId=file_id)
+        on_success = (lambda _: self.tree.remove(file_id)) if self.tree is not None else None
+        self._queue(request, on_success, "delete_errors", {"folder": name, "file_id": file_id})
+
+    def probe_empty(self, folder_id, on_empty, name=None):
+        request = self.service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false", fields="files(id)", pageSize=1
+        )
+        self._queue(request, lambda r: on_empty() if not r.get("files") else None,
+                    "probe_errors", {"folder": name, "file_id": folder_id})
@@ -0,0 +1,126 @@
+# ✅ drive_sync.py – Persisted Sync Manifest + Drive Change Feed
+import json
+import os
+import time
+from collections import Counter
+from metrics import DRIVE_CALLS, DRIVE_RETRIES
+
+sync_manifest_path = "sync_manifest.json"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, mimeType, size, parents, md5Checksum, modifiedTime, trashed"
+# ownedByMe / sharedWithMeTime decide whether a changed item is in sorting scope at all
+CHANGE_FIELDS = f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, ownedByMe, sharedWithMeTime))"
+DRIVE_API_RETRIES = int(os.getenv("DRIVE_API_RETRIES", 4))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 🧾 file id → what we last saw and did with it, plus the change-feed cursor
+class SyncManifest:
+    def __init__(self, path=sync_manifest_path):
+        self.path = path
+        self.files = {}
+        self.page_token = None
+        self._hash_refs = Counter()  # content hash → manifest entries holding it
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.page_token = data.get("page_token")
+        except Exception:
+            self.files, self.page_token = {}, None
+        self._hash_refs = Counter(e["content_hash"] for e in self.files.values() if e.get("content_hash"))
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"page_token": self.page_token, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def is_unchanged(self, item):
+        entry = self.files.get(item["id"])
+        if entry is None or entry["name"] != item["name"]:
+            return False  # the index is keyed by name, so a rename is a change
+        if item.get("md5Checksum") and entry.get("md5Checksum"):
+            return item["md5Checksum"] == entry["md5Checksum"]
+        return (item.get("modifiedTime"), str(item.get("size", ""))) == (entry.get("modifiedTime"), entry.get("size"))
+
+    def _unref(self, entry):
+        h = entry.get("content_hash") if entry else None
+        if h:
+            self._hash_refs[h] -= 1
+            if self._hash_refs[h] <= 0:
+                del self._hash_refs[h]
+        return entry
+
+    def record(self, item, status, content_hash=None, doc_id=None):
+        """Returns the entry it replaced (None for a new file)."""
+        if content_hash:
+            self._hash_refs[content_hash] += 1
+        previous = self._unref(self.files.get(item["id"]))
+        self.files[item["id"]] = {
+            "name": item["name"],
+            "md5Checksum": item.get("md5Checksum"),
+            "modifiedTime": item.get("modifiedTime"),
+            "size": str(item.get("size", "")),
+            "content_hash": content_hash,
+            "doc_id": doc_id,
+            "status": status,
+        }
+        return previous
+
+    def forget(self, file_id):
+        return self._unref(self.files.pop(file_id, None))
+
+    def names(self):
+        return {e["name"] for e in self.files.values()}
+
+    def content_hashes(self):
+        return set(self._hash_refs)
+
+    def uses_hash(self, content_hash):
+        return content_hash in self._hash_refs
+
+# 📡 Every Drive request goes through here: counted per op, retried with backoff on rate limits / 5xx / network errors
+def execute(request, op, retries=DRIVE_API_RETRIES):
+    for attempt in range(retries + 1):
+        DRIVE_CALLS.inc(op=op)
+        try:
+            return request.execute()
+        except Exception as e:
+            status = getattr(getattr(e, "resp", None), "status", None)
+            transient = isinstance(e, OSError) or (status is not None and int(status) in RETRY_STATUSES)
+            if attempt == retries or not transient:
+                raise
+            DRIVE_RETRIES.inc(op=op)
+            time.sleep(min(2 ** attempt, 30))
+
+# 🔖 Cursor to take before a full listing so nothing changes unseen in between
+def get_start_page_token(service):
+    return execute(service.changes().getStartPageToken(supportsAllDrives=True), "changes.getStartPageToken")["startPageToken"]
+
+# 🔁 Collapse the change feed since `page_token` into (changed items, removed ids, next token)
+def list_changes(service, page_token):
+    changed, removed = {}, set()
+    while True:
+        response = execute(service.changes().list(
+            pageToken=page_token,
+            spaces="drive",
+            fields=CHANGE_FIELDS,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        ), "changes.list")
+        for change in response.get("changes", []):
+            item = change.get("file") or {}
+            if change.get("removed") or item.get("trashed"):
+                removed.add(change["fileId"])
+                changed.pop(change["fileId"], None)
+            elif item:
+                changed[item["id"]] = item
+                removed.discard(item["id"])
+        if response.get("newStartPageToken"):
+            return list(changed.values()), removed, response["newStartPageToken"]
+        page_token = response["nextPageToken"]
@@ -0,0 +1,67 @@
+# ✅ drive_tree.py – Cached Drive Folder Tree (parent/child maps, name lookup)
+import json
+import os
+
+folder_tree_path = "folder_tree.json"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+# 🌳 id → (name, is_folder, parents) for every item we have seen, plus child sets
+class FolderTree:
+    def __init__(self, path=folder_tree_path):
+        self.path = path
+        self.root_id = None
+        self.items = {}
+        self.children = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.root_id = data.get("root_id")
+            for item_id, (name, is_folder, parents) in data.get("items", {}).items():
+                self._put(item_id, name, is_folder, parents)
+        except Exception:
+            self.clear()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"root_id": self.root_id, "items": self.items}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.items, self.children = {}, {}
+
+    def _put(self, item_id, name, is_folder, parents):
+        self.remove(item_id)
+        self.items[item_id] = (name, is_folder, list(parents))
+        for parent in parents:
+            self.children.setdefault(parent, set()).add(item_id)
+
+    def add(self, item):
+        self._put(item["id"], item["name"], item["mimeType"] == FOLDER_MIME, item.get("parents", []))
+
+    def remove(self, item_id):
+        old = self.items.pop(item_id, None)
+        if old is not None:
+            for parent in old[2]:
+                self.children.get(parent, set()).discard(item_id)
+
+    def reparent(self, item_id, parents):
+        if item_id in self.items:
+            name, is_folder, _ = self.items[item_id]
+            self._put(item_id, name, is_folder, parents)
+
+    def is_empty(self, folder_id):
+        return not self.children.get(folder_id)
+
+    def find_folder(self, name, parent=None):
+        parent = parent or self.root_id
+        for child in self.children.get(parent, ()):
+            child_name, is_folder, _ = self.items[child]
+            if is_folder and child_name == name:
+                return child
+        return None
@@ -0,0 +1,164 @@
+# ✅ embeddings.py – Batched Encoding, Content-Hash Embedding Cache
+import glob
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+embedding_cache_path = "embedding_cache.json"  # encoder tag + segment list; segments sit next to it
+legacy_embedding_cache_path = "embedding_cache.npz"  # single file rewritten on every save
+
+# 🔐 Content hash (same md5 used for file_hashes)
+def content_hash(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+# 🏷️ Which encoder produced a vector: other models, or the same model on another backend, don't mix
+def encoder_id(model):
+    return f"{getattr(model, 'backend', 'torch')}:{getattr(model, 'model_name', type(model).__name__)}"
+
+def _segment_rows(vectors):
+    # {md5: vector} → rows sorted by hash, the on-disk segment layout
+    hashes = sorted(vectors)
+    dim = len(vectors[hashes[0]]) if hashes else 0
+    rows = np.empty(len(hashes), dtype=[("hash", "S32"), ("vector", "float32", (dim,))])
+    rows["hash"] = hashes
+    if hashes:
+        rows["vector"] = np.vstack([vectors[h] for h in hashes])
+    return rows
+
+def _merge_rows(parts):
+    rows = np.concatenate([np.asarray(p) for p in parts])
+    _, first = np.unique(rows["hash"], return_index=True)  # sorted; same hash = same vector
+    return rows[first]
+
+# 💾 Persistent md5 → vector cache, tagged with the encoder that filled it. Saves append a sorted
+# segment of the new vectors (mmap'd on load, looked up by binary search), so an upsert writes only
+# what it embedded; neighbouring segments merge once they are within 2x, keeping O(log n) of them
+class EmbeddingCache:
+    def __init__(self, path=embedding_cache_path):
+        self.path = path
+        self.encoder = None
+        self._segments = None  # [(file name or None if unsaved, rows)]; read on first use
+        self._pending = {}
+        self.dirty = False
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self.load()
+        return self._segments
+
+    def __len__(self):
+        return sum(len(rows) for _, rows in self.segments) + len(self._pending)
+
+    def _at(self, name):
+        return os.path.join(os.path.dirname(self.path), name)
+
+    def load(self):
+        self._segments, self._pending, self.encoder, self.dirty = [], {}, None, False
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            self.encoder = state.get("encoder")
+            self._segments = [
+                (name, np.load(self._at(name), mmap_mode="r", allow_pickle=False)) for name in state["segments"]
+            ]
+        except Exception:
+            self._segments, self.encoder = [], None
+
+    def bind(self, encoder):
+        # A cache filled by another encoder (or an untagged one from before tagging) starts over
+        segments = self.segments  # loads the stored tag
+        if self.encoder != encoder:
+            self.dirty = self.dirty or bool(segments or self._pending)
+            self._segments, self._pending, self.encoder = [], {}, encoder
+
+    def lookup(self, hashes):
+        """{md5: vector} for the hashes the cache holds; newest segment first."""
+        found = {h: self._pending[h] for h in hashes if h in self._pending}
+        wanted = np.array(sorted(set(hashes) - set(found)), dtype="S32")
+        for _, rows in reversed(self.segments):
+            if not len(wanted):
+                break
+            if not len(rows):
+                continue
+            pos = np.searchsorted(rows["hash"], wanted)
+            hit = pos < len(rows)
+            hit[hit] = rows["hash"][pos[hit]] == wanted[hit]
+            for h, vector in zip(wanted[hit].tolist(), rows["vector"][pos[hit]]):
+                found[h.decode()] = vector
+            wanted = wanted[~hit]
+        return found
+
+    def add(self, h, vector):
+        self._pending[h] = vector
+        self.dirty = True
+
+    def prune(self, keep):
+        # Full rebuilds only: the live vectors become one segment and every other file goes on save
+        wanted = np.array(sorted(keep), dtype="S32")
+        parts = [rows[np.isin(rows["hash"], wanted)] for _, rows in self.segments if len(rows)]
+        if self._pending:
+            parts.append(_segment_rows({h: v for h, v in self._pending.items() if h in keep}))
+        parts = [p for p in parts if len(p)]
+        before = len(self)
+        self._segments, self._pending = ([(None, _merge_rows(parts))] if parts else []), {}
+        self.dirty = self.dirty or len(self) != before or len(parts) > 1
+
+    def save(self):
+        if not self.dirty:
+            return
+        segments = self.segments
+        if self._pending:
+            segments.append((None, _segment_rows(self._pending)))
+            self._pending = {}
+        while len(segments) > 1 and len(segments[-2][1]) <= 2 * len(segments[-1][1]):
+            segments[-2:] = [(None, _merge_rows([segments[-2][1], segments[-1][1]]))]
+
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        for i, (name, rows) in enumerate(segments):
+            if name is None:
+                name = f"{stem}-{uuid.uuid4().hex[:12]}.npy"
+                tmp_path = self._at(name)[:-len(".npy")] + ".tmp.npy"
+                np.save(tmp_path, rows, allow_pickle=False)
+                os.replace(tmp_path, self._at(name))
+                segments[i] = (name, np.load(self._at(name), mmap_mode="r", allow_pickle=False))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"encoder": self.encoder, "segments": [name for name, _ in segments]}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+        # Merged-away segments and the pre-segment single-file cache; open mmaps keep their pages
+        live = {self._at(name) for name, _ in segments}
+        for path in glob.glob(self._at(f"{stem}-*.npy")) + [self._at(legacy_embedding_cache_path)]:
+            if path not in live and os.path.exists(path):
+                os.remove(path)
+
+# 🧠 Encode only what the cache hasn't seen, in fixed-size batches
+def embed_texts(model, texts, cache=None, batch_size=EMBED_BATCH_SIZE):
+    if cache is not None:
+        cache.bind(encoder_id(model))
+    hashes = [content_hash(t) for t in texts]
+    known = cache.lookup(hashes) if cache is not None else {}
+    pending = {}
+    for h, t in zip(hashes, texts):
+        if h not in known and h not in pending:
+            pending[h] = t
+
+    pending_hashes = list(pending)
+    for start in range(0, len(pending_hashes), batch_size):
+        batch = pending_hashes[start:start + batch_size]
+        vectors = model.encode([pending[h] for h in batch], batch_size=batch_size, convert_to_numpy=True)
+        for h, v in zip(batch, vectors.astype("float32")):
+            known[h] = v
+            if cache is not None:
+                cache.add(h, v)
+
+    if not hashes:
+        return np.empty((0, 0), dtype="float32")
+    return np.vstack([known[h] for h in hashes]).astype("float32")
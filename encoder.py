@@ -0,0 +1,140 @@
+# ✅ encoder.py – Pluggable Sentence Encoder (PyTorch or ONNX Runtime int8)
+import os
+import threading
+import numpy as np
+
+ENCODER_MODEL = os.getenv("ENCODER_MODEL", "all-MiniLM-L6-v2")
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")  # torch | onnx
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", 0))  # 0 = runtime default (all cores)
+ENCODER_PARITY_THRESHOLD = float(os.getenv("ENCODER_PARITY_THRESHOLD", 0.99))
+onnx_model_path = os.getenv("ONNX_MODEL_PATH", "encoder_int8.onnx")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+ONNX_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]  # BertModel.forward order
+
+def _hub_name(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+# ⚡ Same encode() surface as SentenceTransformer: token embeddings → mean pooling → L2 norm
+class OnnxEncoder:
+    backend = "onnx"
+
+    def __init__(self, path=onnx_model_path, model_name=ENCODER_MODEL, threads=ENCODER_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = None
+
+    def get_sentence_embedding_dimension(self):
+        if self.dim is None:
+            self.dim = self.encode(["dimension probe"]).shape[1]
+        return self.dim
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        # Longest first, so each batch pads to similar lengths
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        vectors = [None] * len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            rows = order[start:start + batch_size]
+            tokens = self.tokenizer([sentences[i] for i in rows], padding=True, truncation=True,
+                                    max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            feeds = {name: tokens[name].astype("int64") for name in self.input_names if name in tokens}
+            hidden = self.session.run(None, feeds)[0]
+            mask = tokens["attention_mask"][..., None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            for row, vector in zip(rows, pooled.astype("float32")):
+                vectors[row] = vector
+        vectors = np.vstack(vectors)
+        self.dim = vectors.shape[1]
+        return vectors[0] if single else vectors
+
+# 📤 Export the Hugging Face encoder to ONNX and quantize its weights to int8 (dynamic quantization)
+def export_onnx(model_name=ENCODER_MODEL, path=onnx_model_path):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name)).eval()
+    sample = tokenizer(["export sample sentence"], return_tensors="pt")
+    fp32_path = os.path.splitext(path)[0] + "_fp32.onnx"
+    axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in ONNX_INPUTS), fp32_path,
+            input_names=ONNX_INPUTS, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=14
+        )
+    quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    return path
+
+# 🔌 Backend chosen by ENCODER_BACKEND; a missing ONNX export falls back to PyTorch
+def load_encoder(backend=ENCODER_BACKEND, model_name=ENCODER_MODEL):
+    if backend == "onnx":
+        if os.path.exists(onnx_model_path):
+            return OnnxEncoder(onnx_model_path, model_name)
+        print(f"⚠️ {onnx_model_path} not found (run benchmark_encoder.py export); using PyTorch encoder")
+    elif backend != "torch":
+        raise ValueError(f"Unknown ENCODER_BACKEND: {backend}")
+    from sentence_transformers import SentenceTransformer
+    encoder = SentenceTransformer(model_name)
+    encoder.backend = "torch"  # what actually loaded, whatever was asked for
+    return encoder
+
+# 💤 Same surface, but the backend loads on first use (or from a background warm-up), so imports never wait on it
+class LazyEncoder:
+    def __init__(self, backend=ENCODER_BACKEND, model_name=ENCODER_MODEL):
+        self.requested_backend = backend
+        self.model_name = model_name
+        self._encoder = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._encoder is not None
+
+    def get(self):
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    self._encoder = load_encoder(self.requested_backend, self.model_name)
+        return self._encoder
+
+    @property
+    def backend(self):
+        # The one serving encodes: an ONNX request without an export runs on PyTorch (and tags vectors so)
+        return self.get().backend
+
+    def warm_up(self):
+        # One tiny encode also pays the runtime's first-call setup (thread pools, kernels)
+        self.get().encode(["warm-up"], convert_to_numpy=True)
+
+    def encode(self, *args, **kwargs):
+        return self.get().encode(*args, **kwargs)
+
+    def get_sentence_embedding_dimension(self):
+        return self.get().get_sentence_embedding_dimension()
+
+# ✅ Row-wise cosine between two encoders' embeddings of the same texts
+def parity(reference, candidate, texts, threshold=ENCODER_PARITY_THRESHOLD):
+    a = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype="float32")
+    b = np.asarray(candidate.encode(texts, convert_to_numpy=True), dtype="float32")
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        "texts": len(texts),
+        "min_cosine": round(float(cosine.min()), 5),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "threshold": threshold,
+        "passed": bool(cosine.min() >= threshold)
+    }
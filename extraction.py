@@ -0,0 +1,217 @@
+# ✅ extraction.py – Text Extraction + Sandboxed Worker-Process Service
+import io
+import os
+import sys
+import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing.connection import wait
+import fitz  # PyMuPDF
+import docx
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory cap
+    resource = None
+
+# 📜 Extract readable content from a path, raw bytes or a binary stream
+def extract_text(source, ext):
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        if ext == ".pdf":
+            pdf = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source.read(), filetype="pdf")
+            with pdf:
+                return " ".join([page.get_text() for page in pdf])
+        elif ext == ".docx":
+            return " ".join([p.text for p in docx.Document(source).paragraphs])
+        elif ext in [".txt", ".md", ".html", ".csv"]:
+            if not isinstance(source, str):
+                return source.read().decode("utf-8", errors="ignore")
+            with open(source, "r", encoding="utf-8", errors="ignore") as f:
+                return f.read()
+    except MemoryError:
+        raise
+    except Exception:
+        return ""
+    return ""
+
+# ⚙️ Extraction service limits
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", 30))
+EXTRACT_TIMEOUTS = {".pdf": float(os.getenv("EXTRACT_TIMEOUT_PDF", 120)), ".docx": float(os.getenv("EXTRACT_TIMEOUT_DOCX", 60))}
+EXTRACT_MEMORY_MB = int(os.getenv("EXTRACT_MEMORY_MB", 1024))
+EXTRACT_RECYCLE_AFTER = int(os.getenv("EXTRACT_RECYCLE_AFTER", 50))
+
+class ExtractionError(Exception):
+    pass
+
+# 🧼 Workers fork from a server that imported only this module (not the web app) when the platform has one
+def _worker_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["extraction"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+_main_lock = threading.Lock()
+
+@contextmanager
+def _main_hidden():
+    # A new worker re-runs the parent's __main__ (as __mp_main__) to find pickled targets. Ours live here,
+    # so hide the script while it starts; otherwise every worker and every recycle would boot search_faiss
+    # (shared import, index mmap, encoder warm-up) before the memory cap applies
+    main = sys.modules["__main__"]
+    with _main_lock:
+        path, spec = main.__dict__.pop("__file__", None), getattr(main, "__spec__", None)
+        main.__spec__ = None
+        try:
+            yield
+        finally:
+            main.__spec__ = spec
+            if path is not None:
+                main.__file__ = path
+
+def _worker_main(conn, memory_mb):
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        try:
+            conn.send(("ok", extract_text(*task)))
+        except BaseException as e:  # MemoryError from the rlimit lands here
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+class _Worker:
+    def __init__(self, ctx, memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        with _main_hidden():
+            self.process.start()
+        child_conn.close()
+        self.task = None
+        self.deadline = None
+        self.handled = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+# 🏭 One file per worker process at a time, so a stuck or bloated file can be killed alone
+class ExtractionService:
+    def __init__(self, workers=EXTRACT_WORKERS, memory_mb=EXTRACT_MEMORY_MB, recycle_after=EXTRACT_RECYCLE_AFTER):
+        self._ctx = _worker_context()
+        self.memory_mb = memory_mb
+        self.recycle_after = recycle_after
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._wake_r, self._wake_w = self._ctx.Pipe(duplex=False)
+        self._workers = [_Worker(self._ctx, memory_mb) for _ in range(max(1, workers))]
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, source, ext):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ExtractionService is shut down")
+            self._pending.append((source, ext, future))
+        self._wake_w.send_bytes(b"1")
+        return future
+
+    def _replace(self, i):
+        self._workers[i].kill()
+        self._workers[i] = _Worker(self._ctx, self.memory_mb)
+
+    def _finish(self, i, outcome=None, error=None):
+        worker = self._workers[i]
+        future, worker.task, worker.deadline = worker.task[2], None, None
+        worker.handled += 1
+        if error is not None:
+            future.set_exception(error)
+        elif outcome[0] == "error":
+            future.set_exception(ExtractionError(outcome[1]))
+        else:
+            future.set_result(outcome[1])
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                for worker in self._workers:
+                    if worker.task is None and self._pending:
+                        task = self._pending.popleft()
+                        try:
+                            worker.conn.send(task[:2])
+                        except OSError:
+                            # Worker died while idle: put the file back and start a fresh one
+                            self._pending.appendleft(task)
+                            self._replace(self._workers.index(worker))
+                            continue
+                        worker.task = task
+                        worker.deadline = time.monotonic() + EXTRACT_TIMEOUTS.get(task[1], EXTRACT_TIMEOUT)
+                busy = [i for i, w in enumerate(self._workers) if w.task is not None]
+                if self._closed and not busy and not self._pending:
+                    break
+
+            now = time.monotonic()
+            timeout = min((self._workers[i].deadline - now for i in busy), default=None)
+            waitables = [self._wake_r] + [self._workers[i].conn for i in busy] + [self._workers[i].process.sentinel for i in busy]
+            ready = wait(waitables, timeout=max(timeout, 0) if timeout is not None else None)
+            while self._wake_r.poll():
+                self._wake_r.recv_bytes()
+
+            for i in busy:
+                worker = self._workers[i]
+                if worker.conn in ready:
+                    try:
+                        self._finish(i, worker.conn.recv())
+                        if worker.handled >= self.recycle_after:
+                            worker.conn.send(None)
+                            self._replace(i)
+                    except (EOFError, OSError):
+                        worker.process.join(timeout=1)
+                        code = worker.process.exitcode
+                        self._finish(i, error=ExtractionError(f"Extraction worker crashed (exit code {code})"))
+                        self._replace(i)
+                elif worker.process.sentinel in ready:
+                    worker.process.join(timeout=1)
+                    code = worker.process.exitcode
+                    self._finish(i, error=ExtractionError(f"Extraction worker crashed (exit code {code})"))
+                    self._replace(i)
+                elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                    ext = worker.task[1]
+                    limit = EXTRACT_TIMEOUTS.get(ext, EXTRACT_TIMEOUT)
+                    self._finish(i, error=ExtractionError(f"Extraction timed out after {limit:g}s ({ext})"))
+                    self._replace(i)
+
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            worker.kill()
+
+    def shutdown(self, wait_for_pending=True):
+        with self._lock:
+            self._closed = True
+            if not wait_for_pending:
+                while self._pending:
+                    self._pending.popleft()[2].cancel()
+        self._wake_w.send_bytes(b"1")
+        self._thread.join()
@@ -0,0 +1,285 @@
+# ✅ index_factory.py – Flat / IVF / IVF-PQ / HNSW Index Selection by Corpus Size
+import json
+import math
+import os
+import struct
+import faiss
+import numpy as np
+
+# auto | flat | ivf | ivfpq | hnsw (hnsw cannot remove vectors, so it is never picked by auto)
+INDEX_KIND = os.getenv("INDEX_KIND", "auto")
+INDEX_IVF_THRESHOLD = int(os.getenv("INDEX_IVF_THRESHOLD", 50000))
+INDEX_PQ_THRESHOLD = int(os.getenv("INDEX_PQ_THRESHOLD", 1000000))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+PQ_SUBQUANTIZERS = int(os.getenv("PQ_SUBQUANTIZERS", 48))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 80))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+RECALL_K = int(os.getenv("RECALL_K", 10))
+RECALL_SAMPLE = int(os.getenv("RECALL_SAMPLE", 200))
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", 100000))
+FILTER_EXACT_MAX = int(os.getenv("FILTER_EXACT_MAX", 10000))  # filters selecting ≤ this many passages search them all
+FILTER_EF_MAX = int(os.getenv("FILTER_EF_MAX", 1024))  # cap on the widened HNSW beam for larger filters
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "float32")  # float32 | float16 (ivfpq is already compressed)
+INDEX_PCA_DIM = int(os.getenv("INDEX_PCA_DIM", 0))  # 0 = keep the encoder's dimension
+INDEX_FORMAT = 2  # 1 = bare faiss file + ai_search_index.json, 2 = faiss file + JSON header trailer
+INDEX_MAGIC = b"SBINDEX\x00"
+# Serving copies: IFC maps the whole file in place (flat/HNSW codes, IVF lists), so workers share page cache.
+# IO_FLAG_MMAP alone only maps IVF inverted lists, and combined with IFC it fails on IVF; older faiss lacks IFC
+INDEX_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+index_params_path = "ai_search_index.json"  # format 1 only; read once when migrating
+index_transform_path = "ai_search_index.transform"
+
+def choose_kind(n, kind=INDEX_KIND):
+    if kind != "auto":
+        return kind
+    if n < INDEX_IVF_THRESHOLD:
+        return "flat"
+    return "ivf" if n < INDEX_PQ_THRESHOLD else "ivfpq"
+
+def _nlist(n, train):
+    # ~4·√n lists, but keep ≥39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n)), train // 39))
+
+def _pq_m(dim):
+    m = min(PQ_SUBQUANTIZERS, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+def _pca_dim(dim, pca_dim):
+    return pca_dim if 0 < pca_dim < dim else None
+
+# 📐 Storage layout the current config asks for (compared against a loaded index's params)
+def layout(dim, storage=None, pca_dim=None):
+    storage = storage or INDEX_STORAGE
+    if storage not in ("float32", "float16"):
+        raise ValueError(f"Unknown INDEX_STORAGE: {storage}")
+    return {"storage": storage, "pca_dim": _pca_dim(dim, INDEX_PCA_DIM if pca_dim is None else pca_dim)}
+
+# 🏗️ Streaming build: train on a sample, add vectors batch by batch, track exact top-k for recall
+class IndexBuilder:
+    def __init__(self, n, dim, kind=None, storage=None, pca_dim=None, transform=None, transform_version=0):
+        self.kind = choose_kind(n, kind or INDEX_KIND)
+        self.params = {"kind": self.kind, "dim": dim, **layout(dim, storage, pca_dim)}
+        self.queries = None
+        d = self.params["pca_dim"] or dim
+        fp16 = self.params["storage"] == "float16"
+        if self.kind == "flat":
+            inner = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16) if fp16 else faiss.IndexFlatL2(d)
+        elif self.kind in ("ivf", "ivfpq"):
+            train = min(n, INDEX_TRAIN_SAMPLE)
+            nlist = _nlist(n, train)
+            self.quantizer = faiss.IndexFlatL2(d)
+            if self.kind == "ivf" and fp16:
+                inner = faiss.IndexIVFScalarQuantizer(self.quantizer, d, nlist, faiss.ScalarQuantizer.QT_fp16)
+            elif self.kind == "ivf":
+                inner = faiss.IndexIVFFlat(self.quantizer, d, nlist)
+            else:
+                # 8-bit codes want 256·39 training points; smaller corpora get coarser codes
+                self.params.update(m=_pq_m(d), nbits=min(8, max(1, int(math.log2(max(train // 39, 2))))))
+                inner = faiss.IndexIVFPQ(self.quantizer, d, nlist, self.params["m"], self.params["nbits"])
+            inner.nprobe = min(IVF_NPROBE, nlist)
+            self.params.update(nlist=nlist, nprobe=inner.nprobe)
+        elif self.kind == "hnsw":
+            if fp16:
+                inner = faiss.IndexHNSWSQ(d, faiss.ScalarQuantizer.QT_fp16, HNSW_M)
+            else:
+                inner = faiss.IndexHNSWFlat(d, HNSW_M)
+            inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            inner.hnsw.efSearch = HNSW_EF_SEARCH
+            self.params.update(M=HNSW_M, ef_search=HNSW_EF_SEARCH)
+        else:
+            raise ValueError(f"Unknown index kind: {self.kind}")
+        # PCA sits in front of the storage index, so queries go through the same transform
+        self.transform = None
+        self.reused_transform = transform is not None and self.params["pca_dim"] is not None
+        if self.params["pca_dim"]:
+            self.transform = transform if self.reused_transform else faiss.PCAMatrix(dim, d)
+            self.params["transform"] = {
+                "type": "pca", "d_in": dim, "d_out": d,
+                "version": transform_version if self.reused_transform else transform_version + 1
+            }
+            inner = faiss.IndexPreTransform(self.transform, inner)
+        # IVF lists store ids natively (and an IDMap over IVF can't remove_ids); the rest get id-mapped
+        self.index = inner if self.kind in ("ivf", "ivfpq") else faiss.IndexIDMap2(inner)
+        # Anything but float32 flat loses precision, so it gets a recall figure
+        self.lossy = self.kind != "flat" or fp16 or self.transform is not None
+
+    @property
+    def needs_training(self):
+        return not self.index.is_trained
+
+    def train_size(self, n):
+        return min(n, INDEX_TRAIN_SAMPLE) if self.needs_training else 0
+
+    def train(self, vectors):
+        self.index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+    def track_recall(self, queries, k=RECALL_K):
+        # Exact neighbours are accumulated as batches stream past, so no full copy is kept
+        if not self.lossy or not len(queries):
+            return
+        self.queries = np.ascontiguousarray(queries, dtype="float32")
+        self.k = k
+        self.exact = faiss.ResultHeap(len(self.queries), k)
+
+    def add(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        ids = np.asarray(ids, dtype="int64")
+        self.index.add_with_ids(vectors, ids)
+        if self.queries is not None:
+            k = min(self.k, len(vectors))
+            D, I = faiss.knn(self.queries, vectors, k)
+            if k < self.k:
+                pad = ((0, 0), (0, self.k - k))
+                D = np.pad(D, pad, constant_values=np.inf)
+                I = np.pad(I, pad, constant_values=-1)
+            self.exact.add_result(D, np.where(I >= 0, ids[I], -1))
+
+    def finish(self):
+        if self.queries is not None:
+            self.exact.finalize()
+            self.params["recall"] = recall_at_k(self.index, self.queries, self.exact.I)
+        return self.index, self.params
+
+# 📏 recall@k of the approximate index against exact neighbours (ids, -1 for padding)
+def recall_at_k(index, queries, exact, params=None):
+    k = exact.shape[1]
+    _, approx = index.search(queries, k, params=params)
+    hits = sum(len(set(a) & set(e) - {-1}) for a, e in zip(approx.tolist(), exact.tolist()))
+    wanted = int((exact >= 0).sum())
+    return {"k": k, "queries": len(queries), "recall": round(hits / wanted, 4) if wanted else None}
+
+# 🆔 Doc ids held by an index built here (None for indexes without stable ids)
+def index_ids(index):
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map)
+    try:
+        ivf = faiss.extract_index_ivf(index)  # sees through a PCA pre-transform
+    except RuntimeError:
+        return None
+    lists = ivf.invlists
+    return np.concatenate([np.zeros(0, dtype="int64")] + [
+        faiss.rev_swig_ptr(lists.get_ids(i), lists.list_size(i)).copy()
+        for i in range(ivf.nlist) if lists.list_size(i)
+    ])
+
+# 🔍 Inspect a loaded index when it carries no header (format 1 files)
+def describe_index(index):
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    params = {"kind": "flat", "dim": index.d, "storage": "float32", "pca_dim": None}
+    if isinstance(inner, faiss.IndexPreTransform):
+        params["pca_dim"] = inner.index.d
+        inner = faiss.downcast_index(inner.index)
+    if isinstance(inner, (faiss.IndexIVFFlat, faiss.IndexIVFPQ, faiss.IndexIVFScalarQuantizer)):
+        params.update(kind="ivfpq" if isinstance(inner, faiss.IndexIVFPQ) else "ivf", nlist=inner.nlist, nprobe=inner.nprobe)
+    elif isinstance(inner, (faiss.IndexHNSWFlat, faiss.IndexHNSWSQ)):
+        params.update(kind="hnsw", ef_search=inner.hnsw.efSearch)
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer, faiss.IndexHNSWSQ)):
+        params["storage"] = "float16"
+    return params
+
+def supports_removal(params):
+    return params.get("kind") != "hnsw"
+
+# ⚙️ Per-query knobs + optional IDSelector; None keeps the index defaults.
+# A selector admitting `selected` of `ntotal` passages only matches that fraction of what IVF probes or the
+# HNSW beam visits, so both widen by the inverse fraction; small IVF selections probe every list (exact)
+def search_parameters(params, nprobe=None, ef_search=None, sel=None, selected=None, ntotal=None):
+    kind = params.get("kind")
+    widen = max(1.0, ntotal / selected) if sel is not None and selected and ntotal else 1.0
+    if kind in ("ivf", "ivfpq") and (nprobe or sel is not None):
+        nprobe = int(nprobe or params.get("nprobe", IVF_NPROBE))
+        nlist = params.get("nlist", nprobe)
+        if sel is not None and selected is not None:
+            nprobe = nlist if selected <= FILTER_EXACT_MAX else min(nlist, math.ceil(nprobe * widen))
+        search = faiss.SearchParametersIVF(nprobe=nprobe)
+    elif kind == "hnsw" and (ef_search or sel is not None):
+        ef_search = int(ef_search or params.get("ef_search", HNSW_EF_SEARCH))
+        search = faiss.SearchParametersHNSW(efSearch=max(ef_search, min(math.ceil(ef_search * widen), FILTER_EF_MAX)))
+    elif sel is not None:
+        search = faiss.SearchParameters()
+    else:
+        return None
+    if sel is not None:
+        search.sel = sel
+        search.selector = sel  # keeps the Python selector alive as long as the params
+    return search
+
+# 🎯 Exact index over a few stored HNSW vectors: a graph walk under a tight filter runs out of allowed
+# neighbours, a flat scan of the selected codes can't. Same space and transform as `index`
+def exact_subindex(index, ids):
+    inner = faiss.downcast_index(index.index)
+    pre = inner if isinstance(inner, faiss.IndexPreTransform) else None
+    graph = faiss.downcast_index(pre.index) if pre is not None else inner
+    id_map = faiss.vector_to_array(index.id_map)
+    positions = np.flatnonzero(np.isin(id_map, ids))
+    sub = faiss.IndexIDMap(faiss.IndexFlatL2(graph.d))
+    if len(positions):
+        sub.add_with_ids(graph.reconstruct_batch(positions), id_map[positions])
+    return faiss.IndexPreTransform(pre.chain.at(0), sub) if pre is not None else sub
+
+# 💾 Format 2: the faiss payload, then JSON params, their length and a magic tag.
+# faiss readers stop at the end of the payload, so the trailer doesn't affect read_index / mmap
+def _append_header(path, header):
+    header = json.dumps(dict(header, format=INDEX_FORMAT)).encode()
+    with open(path, "ab") as f:
+        f.write(header + struct.pack("<I", len(header)) + INDEX_MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_index_file(index, params, path):
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    _append_header(tmp_path, params)
+    os.replace(tmp_path, path)
+
+# 📖 Header of a format 2 file; None for a bare (format 1) faiss file
+def read_header(path):
+    tail_size = 4 + len(INDEX_MAGIC)
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < tail_size:
+            return None
+        f.seek(size - tail_size)
+        tail = f.read(tail_size)
+        if tail[4:] != INDEX_MAGIC:
+            return None
+        (length,) = struct.unpack("<I", tail[:4])
+        f.seek(size - tail_size - length)
+        try:
+            return json.loads(f.read(length))
+        except ValueError:
+            return None
+
+# 🧮 The trained PCA is kept next to the index (same header format) and reused by later
+# rebuilds of the same shape → (transform, version); version 0 = nothing usable on disk
+def load_transform(dim, pca_dim=None):
+    pca_dim = _pca_dim(dim, INDEX_PCA_DIM if pca_dim is None else pca_dim)
+    if not os.path.exists(index_transform_path):
+        return None, 0
+    header = read_header(index_transform_path) or {}
+    version = header.get("version", 0)
+    if not pca_dim or (header.get("d_in"), header.get("d_out")) != (dim, pca_dim):
+        return None, version
+    try:
+        transform = faiss.read_VectorTransform(index_transform_path)
+    except RuntimeError:
+        return None, version
+    return (transform, version) if transform.is_trained else (None, version)
+
+def save_transform(transform, info):
+    tmp_path = index_transform_path + ".tmp"
+    faiss.write_VectorTransform(transform, tmp_path)
+    _append_header(tmp_path, info)
+    os.replace(tmp_path, index_transform_path)
+
+def load_params(path=index_params_path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
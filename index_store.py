@@ -0,0 +1,123 @@
+# ✅ index_store.py – Versioned On-Disk Index Generations (Atomic Manifest + Cross-Worker Reload)
+import json
+import os
+import shutil
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single process, thread lock only
+    fcntl = None
+
+INDEX_ROOT = os.getenv("INDEX_ROOT", "index")
+INDEX_KEEP_GENERATIONS = int(os.getenv("INDEX_KEEP_GENERATIONS", 3))
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", 1))
+manifest_path = os.path.join(INDEX_ROOT, "MANIFEST.json")
+writer_lock_path = os.path.join(INDEX_ROOT, ".writer.lock")
+
+def generation_dir(generation, root=INDEX_ROOT):
+    return os.path.join(root, f"gen-{generation:06d}")
+
+def read_manifest(path=manifest_path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _link(src, dst):
+    # Every writer replaces its files (new inode) rather than editing them, so a hard link is a free,
+    # immutable copy; the append-only text blob only grows past the offsets this generation uses
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+# 📦 Link `files` ({name: current path}) into gen-N, then point the manifest at it (os.replace = atomic)
+def publish_generation(files, info=None, root=INDEX_ROOT, keep=INDEX_KEEP_GENERATIONS):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, "MANIFEST.json")
+    generation = (read_manifest(path) or {}).get("generation", 0) + 1
+    target = generation_dir(generation, root)
+    tmp_dir = target + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    names = []
+    for name, src in files.items():
+        if os.path.exists(src):
+            _link(src, os.path.join(tmp_dir, name))
+            names.append(name)
+    os.rename(tmp_dir, target)
+    manifest = dict(info or {}, generation=generation, dir=os.path.basename(target), files=names, created=time.time())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _prune(root, generation - keep)
+    return manifest
+
+def _prune(root, oldest_kept):
+    # Workers still mapping a pruned generation keep reading it: unlinked inodes live until unmapped
+    for name in os.listdir(root):
+        if name.startswith("gen-") and not name.endswith(".tmp"):
+            try:
+                if int(name[4:]) <= oldest_kept:
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            except ValueError:
+                continue
+
+# 👀 Cheap change check: one stat() per poll interval, manifest read only when the file was replaced
+class GenerationWatcher:
+    def __init__(self, path=manifest_path, interval=INDEX_POLL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self._next_check = 0.0
+        self._signature = None
+
+    def poll(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature and not force:
+            return None
+        self._signature = signature
+        return read_manifest(self.path)
+
+    def reset(self):
+        self._signature = None
+        self._next_check = 0.0
+
+# 🔐 Re-entrant within a process, exclusive across gunicorn workers (flock on a lock file)
+class WriterLock:
+    def __init__(self, path=writer_lock_path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
@@ -0,0 +1,162 @@
+# ✅ ingest_job.py – Resumable Ingestion Jobs (Durable Cursor + Checkpoints + Single-Flight Scheduler)
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single process, thread lock only
+    fcntl = None
+
+ingest_job_path = "ingest_job.json"
+ingest_lock_path = "ingest.lock"
+CHECKPOINT_FILES = int(os.getenv("INGEST_CHECKPOINT_FILES", 200))        # files handled between checkpoints
+CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", 300))  # ...or seconds, whichever comes first
+
+# 🧾 One Drive run: what it was asked to do and how far it got. The per-file cursor is the sync manifest,
+# saved at every checkpoint; this file says whether a run died mid-way and should be resumed as-is
+class IngestJob:
+    def __init__(self, path=ingest_job_path):
+        self.path = path
+        self.state = {}
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._started = time.monotonic()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.state = json.load(f)
+        except Exception:
+            self.state = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def interrupted(self):
+        # Only read under the ingest lock, so "running" means the owner died mid-run; "failed" hit a fatal error
+        return self.state.get("status") in ("running", "failed")
+
+    def begin(self, full=False):
+        now = datetime.utcnow().isoformat()
+        if self.interrupted:
+            self.state["resumes"] = self.state.get("resumes", 0) + 1
+            self.state["full"] = bool(self.state.get("full") or full)
+            self.state["resumed_at"] = now
+        else:
+            self.state = {
+                "id": uuid.uuid4().hex[:12], "status": "running", "full": bool(full), "started": now,
+                "resumes": 0, "committed": 0, "checkpoints": 0
+            }
+        self.state.update({"total": 0, "total_bytes": 0, "done": 0, "bytes": 0})
+        self._started = self._last_checkpoint = time.monotonic()
+        self._since_checkpoint = 0
+        self.save()
+        return self.state["resumes"] > 0
+
+    def plan(self, total, total_bytes):
+        self.state.update({"total": total, "total_bytes": total_bytes})
+
+    def advance(self, size=0):
+        self.state["done"] += 1
+        self.state["bytes"] += int(size or 0)
+        self._since_checkpoint += 1
+
+    def due(self):
+        return self._since_checkpoint >= CHECKPOINT_FILES or time.monotonic() - self._last_checkpoint >= CHECKPOINT_SECONDS
+
+    def checkpointed(self):
+        self.state["committed"] += self._since_checkpoint
+        self.state["checkpoints"] += 1
+        self.state["last_checkpoint"] = datetime.utcnow().isoformat()
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self.save()
+
+    def finish(self, error=None, resumable=True):
+        self.state["status"] = ("failed" if resumable else "aborted") if error else "done"
+        self.state["finished"] = datetime.utcnow().isoformat()
+        if error:
+            self.state["error"] = str(error)
+        self.save()
+
+    # 📈 This attempt's throughput; ETA assumes the remaining files look like the ones done so far
+    def progress(self):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        done, total = self.state.get("done", 0), self.state.get("total", 0)
+        files_per_s = done / elapsed
+        return {
+            "job": self.state.get("id"),
+            "resumes": self.state.get("resumes", 0),
+            "done": done,
+            "total": total,
+            "bytes": self.state.get("bytes", 0),
+            "total_bytes": self.state.get("total_bytes", 0),
+            "checkpoints": self.state.get("checkpoints", 0),
+            "last_checkpoint": self.state.get("last_checkpoint"),
+            "files_per_s": round(files_per_s, 3),
+            "bytes_per_s": round(self.state.get("bytes", 0) / elapsed, 1),
+            "eta_s": round((total - done) / files_per_s, 1) if files_per_s and total > done else None,
+        }
+
+# 🚦 Single-flight: one run per process (thread check) and per host (non-blocking flock on ingest.lock)
+class JobScheduler:
+    def __init__(self, target, lock_path=ingest_lock_path):
+        self.target = target
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, delay=0, **kwargs):
+        """Starts `target(**kwargs)` after `delay` seconds; False when a run is already scheduled or running."""
+        with self._lock:
+            if self.running or not self._acquire():
+                return False
+            self._thread = threading.Thread(target=self._run, args=(delay, kwargs), daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, delay, kwargs):
+        try:
+            if delay:
+                time.sleep(delay)
+            self.target(**kwargs)
+        finally:
+            self._release()
+
+    def _acquire(self):
+        if fcntl is None:
+            return True
+        self._file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:  # another worker owns the run
+            self._file.close()
+            self._file = None
+            return False
+        return True
+
+    def _release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def status(self, path=ingest_job_path):
+        # Whichever worker owns the run, the last checkpoint is on disk
+        job = IngestJob(path).state
+        return dict(job, scheduled_here=self.running) if job else {"scheduled_here": self.running}
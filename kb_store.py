@@ -0,0 +1,129 @@
+# ✅ kb_store.py – Memory-Mapped Knowledge Base (UTF-8 Blob + Doc Table)
+import mmap
+import os
+from collections.abc import MutableMapping
+import numpy as np
+from embeddings import content_hash
+
+kb_text_path = "kb_text.bin"
+legacy_metadata_path = "ai_metadata.npy"
+
+# 📚 Dict-compatible view: name → text, backed by an append-only blob
+class KnowledgeStore(MutableMapping):
+    def __init__(self, table, path=kb_text_path):
+        self.table = table
+        self.path = path
+        self._map = None
+        self._mapped = 0
+        open(path, "ab").close()
+
+    def _view(self, end):
+        if self._map is None or end > self._mapped:
+            size = os.path.getsize(self.path)
+            if not size:
+                return b""
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = size
+        return self._map
+
+    # 📸 Readers map the blob up front, so a later compact can't shift their offsets
+    def pin(self):
+        self._view(0)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._map, self._mapped = None, 0
+
+    def text(self, doc_id, limit=None):
+        offset, length = self.table.span(doc_id)
+        if limit is not None:
+            length = min(length, limit)
+        data = self._view(offset + length)[offset:offset + length]
+        return data.decode("utf-8", errors="ignore")
+
+    def slice(self, doc_id, start, length):
+        offset, doc_length = self.table.span(doc_id)
+        length = max(0, min(length, doc_length - start))
+        data = self._view(offset + start + length)[offset + start:offset + start + length]
+        return data.decode("utf-8", errors="ignore")
+
+    def __getitem__(self, name):
+        doc_id = self.table.get_id(name)
+        if doc_id is None:
+            raise KeyError(name)
+        return self.text(doc_id)
+
+    def __setitem__(self, name, text):
+        self.update({name: text})
+
+    def __delitem__(self, name):
+        if name not in self.table:
+            raise KeyError(name)
+        self.remove([name])
+
+    def __iter__(self):
+        return iter(list(self.table.ids))
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, name):
+        return name in self.table
+
+    # ➕ Append texts in one write; blank or non-text values drop the entry
+    def update(self, docs=(), **kwargs):
+        docs = dict(docs, **kwargs)
+        entries, dropped = [], []
+        with open(self.path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            for name, text in docs.items():
+                if not isinstance(text, str) or not text.strip():
+                    dropped.append(name)
+                    continue
+                data = text.encode("utf-8")
+                f.write(data)
+                entries.append((name, content_hash(text), offset, len(data)))
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.table.drop([n for n in dropped if n in self.table])
+        if entries:
+            self.table.assign(entries)
+        self.table.save()
+
+    def remove(self, names):
+        dropped = self.table.drop(names)
+        if len(dropped):
+            self.table.save()
+        return dropped
+
+    # 🧹 Rewrite the blob with live texts only (replaced/removed text is garbage)
+    def compact(self):
+        live = sorted(self.table.ids.values())
+        live_bytes = sum(self.table.span(i)[1] for i in live)
+        if live_bytes >= os.path.getsize(self.path) // 2:
+            return
+        tmp_path = self.path + ".tmp"
+        self.table._writable()
+        with open(tmp_path, "wb") as f:
+            for doc_id in live:
+                offset, length = self.table.span(doc_id)
+                f.write(self._view(offset + length)[offset:offset + length])
+                self.table.rows["offset"][doc_id] = f.tell() - length
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._map, self._mapped = None, 0
+        self.table.save()
+
+    # 📦 One-time import of the pickled ai_metadata.npy dict
+    def migrate_legacy(self, path=legacy_metadata_path):
+        if len(self) or not os.path.exists(path):
+            return 0
+        kb = np.load(path, allow_pickle=True).item()
+        if not isinstance(kb, dict):
+            raise ValueError(f"{path} did not contain a dictionary")
+        self.update(kb)
+        return len(self)
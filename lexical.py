@@ -0,0 +1,175 @@
+# ✅ lexical.py – Compact BM25 Inverted Index + Reciprocal Rank Fusion
+import os
+import re
+from array import array
+from collections import Counter
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+RRF_K = int(os.getenv("RRF_K", 60))
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+MAX_TOKEN_CHARS = 64
+lexical_index_path = "lexical_index.npz"
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) <= MAX_TOKEN_CHARS]
+
+# 📦 One immutable generation of postings; readers grab a reference and never see a half-merge
+class _Postings:
+    __slots__ = ("vocab", "offsets", "docs", "tfs", "doc_len", "n_docs", "avgdl")
+
+    def __init__(self, vocab, offsets, docs, tfs, doc_len):
+        self.vocab = vocab                # term → term id
+        self.offsets = offsets            # int64[T+1], postings of term t are [offsets[t], offsets[t+1])
+        self.docs = docs                  # int32 doc ids, grouped by term
+        self.tfs = tfs                    # uint16 term frequencies (capped)
+        self.doc_len = doc_len            # float32 tokens per doc, indexed by doc id (0 = absent)
+        self.n_docs = int(np.count_nonzero(doc_len))
+        self.avgdl = float(doc_len.sum()) / self.n_docs if self.n_docs else 0.0
+
+    def term_column(self):
+        return np.repeat(np.arange(len(self.offsets) - 1, dtype="int32"), np.diff(self.offsets))
+
+def _empty():
+    return _Postings({}, np.zeros(1, dtype="int64"), np.zeros(0, dtype="int32"), np.zeros(0, dtype="uint16"),
+                     np.zeros(0, dtype="float32"))
+
+# ✍️ Accumulates (term, doc, tf) triples in typed arrays while docs stream past
+class LexicalBuilder:
+    def __init__(self, vocab=None):
+        self.vocab = dict(vocab or {})
+        self.terms = array("i")
+        self.docs = array("i")
+        self.tfs = array("H")
+        self.lengths = {}
+
+    def add(self, doc_id, text):
+        tokens = tokenize(text)
+        self.lengths[doc_id] = max(len(tokens), 1)  # 0 marks an absent doc
+        for term, tf in Counter(tokens).items():
+            self.terms.append(self.vocab.setdefault(term, len(self.vocab)))
+            self.docs.append(doc_id)
+            self.tfs.append(min(tf, 65535))
+
+    def arrays(self):
+        return (np.frombuffer(self.terms, dtype="int32"), np.frombuffer(self.docs, dtype="int32"),
+                np.frombuffer(self.tfs, dtype="uint16"))
+
+def _pack(vocab, terms, docs, tfs, doc_len):
+    order = np.argsort(terms, kind="stable")
+    counts = np.bincount(terms, minlength=len(vocab))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype("int64")
+    return _Postings(vocab, offsets, docs[order].astype("int32"), tfs[order].astype("uint16"), doc_len)
+
+def _doc_lengths(doc_len, lengths):
+    if lengths:
+        size = max(max(lengths) + 1, len(doc_len))
+        doc_len = np.concatenate([doc_len, np.zeros(size - len(doc_len), dtype="float32")])
+        doc_len[list(lengths)] = list(lengths.values())
+    return doc_len
+
+# 🔤 BM25 over whole documents, keyed by doc table id
+class LexicalIndex:
+    def __init__(self, path=lexical_index_path):
+        self.path = path
+        self._data = None  # read on first use, so importing shared doesn't load postings nobody queries
+
+    def __len__(self):
+        return self._postings().n_docs
+
+    def _postings(self):
+        if self._data is None:
+            self.load()
+        return self._data
+
+    def load(self):
+        self._data = _empty()
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as f:
+                vocab = {term: i for i, term in enumerate(f["vocab"].tolist())}
+                self._data = _Postings(vocab, f["offsets"], f["docs"], f["tfs"], f["doc_len"])
+        except Exception:
+            self._data = _empty()
+
+    def save(self):
+        data = self._postings()
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, vocab=np.array(list(data.vocab), dtype=str), offsets=data.offsets,
+                 docs=data.docs, tfs=data.tfs, doc_len=data.doc_len)
+        os.replace(tmp_path, self.path)
+
+    def doc_ids(self):
+        return np.flatnonzero(self._postings().doc_len)
+
+    def install(self, builder):
+        # Swap in a freshly built generation (rebuild pass)
+        terms, docs, tfs = builder.arrays()
+        doc_len = _doc_lengths(np.zeros(0, dtype="float32"), builder.lengths)
+        self._data = _pack(builder.vocab, terms, docs, tfs, doc_len)
+
+    # 🔁 Replace/remove docs by rewriting the postings arrays (vectorised, one pass per batch)
+    def update(self, docs=None, removed=()):
+        data = self._postings()
+        builder = LexicalBuilder(data.vocab)
+        for doc_id, text in (docs or {}).items():
+            builder.add(doc_id, text)
+        dropped = np.array(list(removed) + list(builder.lengths), dtype="int32")
+        keep = ~np.isin(data.docs, dropped)
+        new_terms, new_docs, new_tfs = builder.arrays()
+        doc_len = data.doc_len.copy()
+        doc_len[dropped[dropped < len(doc_len)]] = 0
+        self._data = _pack(
+            builder.vocab,
+            np.concatenate([data.term_column()[keep], new_terms]),
+            np.concatenate([data.docs[keep], new_docs]),
+            np.concatenate([data.tfs[keep], new_tfs]),
+            _doc_lengths(doc_len, builder.lengths)
+        )
+
+    def remove(self, doc_ids):
+        self.update(removed=doc_ids)
+
+    # 🔎 Top-k (doc id, score); no model involved. `allowed` is an optional bool mask over doc ids
+    def search(self, query, k=10, allowed=None):
+        data = self._postings()
+        tids = {data.vocab.get(t) for t in tokenize(query)} - {None}
+        if not tids or not data.n_docs:
+            return []
+        doc_parts, score_parts = [], []
+        for tid in tids:
+            start, end = data.offsets[tid], data.offsets[tid + 1]
+            if start == end:
+                continue
+            docs = data.docs[start:end]
+            tf = data.tfs[start:end].astype("float32")
+            df = end - start
+            idf = np.log1p((data.n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * data.doc_len[docs] / data.avgdl)
+            doc_parts.append(docs)
+            score_parts.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not doc_parts:
+            return []
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if allowed is not None:
+            keep = docs < len(allowed)
+            keep[keep] = allowed[docs[keep]]
+            docs, scores = docs[keep], scores[keep]
+            if not len(docs):
+                return []
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(docs[i]), float(scores[i])) for i in top]
+
+# 🤝 Reciprocal rank fusion of ranked doc-id lists → [(doc id, score)], best first
+def rrf_fuse(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
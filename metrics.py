@@ -0,0 +1,182 @@
+# ✅ metrics.py – Prometheus-Style Metrics (Counters, Gauges, Histograms + Cheap Stage Timers)
+import bisect
+import os
+import threading
+import time
+from functools import wraps
+import psutil
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FILE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}" if pairs else ""
+
+# 📏 Base: name, help, label names; values keyed by the label-value tuple (one dict lookup per update)
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in items]
+
+# 📐 Set directly, or computed at scrape time from a callback (free on the hot path)
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def track(self, fn):
+        self.fn = fn
+
+    def _samples(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = None
+            return [f"{self.name} {value}"] if value is not None else []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in items]
+
+# 📊 Fixed buckets: observe() is a bisect plus two adds under the lock; cumulated only when scraped
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        return Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', bound))} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {running}")
+        return lines
+
+# ⏱️ `with HIST.time(ext=".pdf"):` or `@HIST.time()` on a function
+class Timer:
+    __slots__ = ("metric", "labels", "start")
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.start, **self.labels)
+
+    def __call__(self, fn):
+        metric, labels = self.metric, self.labels
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start, **labels)
+        return timed
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# 🔍 Query path
+QUERY_ENCODE = Histogram("salesbot_query_encode_seconds", "Query embedding time per search batch")
+INDEX_SEARCH = Histogram("salesbot_index_search_seconds", "FAISS index.search time per search batch")
+REQUEST_LATENCY = Histogram("salesbot_request_seconds", "End-to-end HTTP request latency", ("endpoint", "method", "status"))
+
+# 📥 Ingestion, per file
+FILE_DOWNLOAD = Histogram("salesbot_file_download_seconds", "Drive download time per file", ("ext",), FILE_BUCKETS)
+FILE_EXTRACT = Histogram("salesbot_file_extract_seconds", "Text extraction time per file (including queueing)", ("ext",), FILE_BUCKETS)
+FILE_EMBED = Histogram("salesbot_file_embed_seconds", "Passage embedding time per file", ("ext",), FILE_BUCKETS)
+DRIVE_CALLS = Counter("salesbot_drive_api_calls_total", "Drive API requests sent", ("op",))
+DRIVE_RETRIES = Counter("salesbot_drive_api_retries_total", "Drive API requests retried after a transient error", ("op",))
+QUARANTINES = Counter("salesbot_quarantined_files_total", "Files moved to Quarantine", ("reason",))
+
+# 📐 Scraped state (index gauges are wired up by shared.py)
+RSS = Gauge("salesbot_rss_bytes", "Resident set size of this worker", fn=lambda: psutil.Process(os.getpid()).memory_info().rss)
+INDEX_VECTORS = Gauge("salesbot_index_vectors", "Vectors in the served index")
+INDEX_DOCS = Gauge("salesbot_index_documents", "Documents in the served snapshot")
+INDEX_BYTES = Gauge("salesbot_index_bytes", "On-disk size of the served index file")
+
+# 🌐 End-to-end latency for every Flask request, labelled by route (not raw path) to keep cardinality fixed
+def track_requests(app):
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=request.endpoint or "unmatched",
+                                    method=request.method, status=response.status_code)
+        return response
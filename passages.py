@@ -0,0 +1,144 @@
+# ✅ passages.py – Overlapping Passage Chunker, Passage Table + Doc-Level Hit Aggregation
+import os
+import numpy as np
+
+PASSAGE_CHARS = int(os.getenv("PASSAGE_CHARS", 800))
+PASSAGE_OVERLAP = int(os.getenv("PASSAGE_OVERLAP", 160))
+PASSAGE_SCORING = os.getenv("PASSAGE_SCORING", "max")  # max | sum
+PASSAGE_OVERFETCH = int(os.getenv("PASSAGE_OVERFETCH", 8))
+passage_table_path = "passages.npy"
+PASSAGE_DTYPE = np.dtype([("doc_id", "i8"), ("offset", "i8"), ("length", "i8")])
+
+# 🆔 FAISS ids are doc_id << 16 | passage number, so a hit names its document directly
+PASSAGE_ID_BITS = 16
+MAX_PASSAGES_PER_DOC = 1 << PASSAGE_ID_BITS
+
+def passage_ids(doc_id, count):
+    return (np.int64(doc_id) << PASSAGE_ID_BITS) | np.arange(count, dtype="int64")
+
+def passage_doc(pid):
+    return int(pid) >> PASSAGE_ID_BITS
+
+# ✂️ Whitespace-aligned, overlapping windows as (byte offset, byte length, text) within the doc
+def iter_passages(text, size=PASSAGE_CHARS, overlap=PASSAGE_OVERLAP):
+    overlap = min(overlap, size // 2)
+    start, byte_pos, n = 0, 0, len(text)
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        chunk = text[start:end]
+        nbytes = len(chunk.encode("utf-8"))
+        if chunk.strip():
+            yield byte_pos, nbytes, chunk
+        if end >= n:
+            return
+        # Step back `overlap` chars, snapped forward to a word boundary
+        next_start = max(start + 1, end - overlap)
+        space = text.find(" ", next_start, end)
+        if space != -1:
+            next_start = space + 1
+        byte_pos += nbytes - len(text[next_start:end].encode("utf-8"))
+        start = next_start
+
+# 🌊 Lazily chunk (doc_id, text) pairs into (doc_id, passage number, offset, length, text)
+def iter_doc_passages(docs, size=PASSAGE_CHARS, overlap=PASSAGE_OVERLAP):
+    for doc_id, text in docs:
+        for j, (offset, length, chunk) in enumerate(iter_passages(text, size, overlap)):
+            if j == MAX_PASSAGES_PER_DOC:
+                break
+            yield doc_id, j, offset, length, chunk
+
+# 🧩 Passage spans in doc order (row j of a doc = passage j), mmap'd for readers
+class PassageStore:
+    def __init__(self, table_path=passage_table_path):
+        self.table_path = table_path
+        self.rows = np.zeros(0, dtype=PASSAGE_DTYPE)
+        self._by_doc = {}
+        self.load()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self):
+        if os.path.exists(self.table_path):
+            try:
+                self.rows = np.load(self.table_path, mmap_mode="r", allow_pickle=False)
+            except Exception:
+                self.rows = np.zeros(0, dtype=PASSAGE_DTYPE)
+        self._index_rows()
+
+    def _index_rows(self):
+        self._by_doc = None  # doc → rows map is built on first lookup, not at load
+
+    @property
+    def by_doc(self):
+        if self._by_doc is None:
+            order = np.argsort(self.rows["doc_id"], kind="stable")
+            doc_ids, starts = np.unique(self.rows["doc_id"][order], return_index=True)
+            self._by_doc = {int(d): rows for d, rows in zip(doc_ids, np.split(order, starts[1:]))} if len(order) else {}
+        return self._by_doc
+
+    def save(self):
+        tmp_path = self.table_path + ".tmp.npy"
+        np.save(tmp_path, np.asarray(self.rows), allow_pickle=False)
+        os.replace(tmp_path, self.table_path)
+
+    def clear(self):
+        self.rows = np.zeros(0, dtype=PASSAGE_DTYPE)
+        self._by_doc = {}
+
+    def append(self, chunks):
+        # `chunks` are row arrays in passage order, one or more per doc
+        chunks = [c for c in chunks if len(c)]
+        if chunks:
+            self.rows = np.concatenate([np.asarray(self.rows)] + chunks)
+            self._index_rows()
+
+    def ids(self, doc_ids):
+        doc_ids = [d for d in doc_ids if d in self.by_doc]
+        if not doc_ids:
+            return np.zeros(0, dtype="int64")
+        return np.concatenate([passage_ids(d, len(self.by_doc[d])) for d in doc_ids])
+
+    def row_ids(self):
+        pids = np.empty(len(self.rows), dtype="int64")
+        for doc_id, rows in self.by_doc.items():
+            pids[rows] = passage_ids(doc_id, len(rows))
+        return pids
+
+    def remove(self, doc_ids):
+        doc_ids = [d for d in doc_ids if d in self.by_doc]
+        if not doc_ids:
+            return
+        keep = ~np.isin(self.rows["doc_id"], doc_ids)
+        self.rows = np.asarray(self.rows)[keep]
+        self._index_rows()
+
+    def span(self, pid):
+        rows = self.by_doc.get(passage_doc(pid))
+        j = int(pid) & (MAX_PASSAGES_PER_DOC - 1)
+        if rows is None or j >= len(rows):
+            return None
+        row = self.rows[rows[j]]
+        return int(row["offset"]), int(row["length"])
+
+# 📊 Fold passage hits into documents: (doc_id, score, best passage id), best first
+def aggregate_hits(distances, ids, top_k, scoring=PASSAGE_SCORING):
+    # Unit-length embeddings: cosine = 1 - L2²/2
+    docs = {}
+    for distance, pid in zip(np.asarray(distances).tolist(), np.asarray(ids).tolist()):
+        if pid < 0:
+            continue
+        doc_id, score = passage_doc(pid), 1.0 - distance / 2.0
+        entry = docs.get(doc_id)
+        if entry is None:
+            docs[doc_id] = [score, pid]
+        elif scoring == "sum":
+            entry[0] += score
+        elif score > entry[0]:
+            entry[:] = [score, pid]
+    ranked = sorted(docs.items(), key=lambda item: -item[1][0])
+    return [(doc_id, score, pid) for doc_id, (score, pid) in ranked[:top_k]]
@@ -0,0 +1,47 @@
+# ✅ query_args.py – Request Argument Validation Shared by search_faiss.py and app.py
+from passages import PASSAGE_SCORING
+from lexical import SEARCH_MODE, SEARCH_MODES
+from doc_meta import filter_key, parse_time
+
+# Every parser raises ValueError on bad input; endpoints turn that into a 400
+
+FILTER_ARGS = ("file_type", "category", "folder", "modified_after", "modified_before")
+
+def filters(args):
+    # file_type / category / Drive folder / modified range → hashable key for selectors and caches
+    values = [args.get(name) for name in FILTER_ARGS]
+    for name, value in zip(FILTER_ARGS, values):
+        if value is not None and not isinstance(value, str):  # JSON batch items can carry any type
+            raise ValueError(f"'{name}' must be a string.")
+    for name in ("modified_after", "modified_before"):
+        try:
+            parse_time(args.get(name), strict=True)  # a bad date would silently drop or empty the filter
+        except ValueError:
+            raise ValueError(f"'{name}' must be an ISO 8601 date, e.g. 2024-01-31.")
+    return filter_key(*values)
+
+def search_options(args):
+    # Per-query recall/latency knobs for IVF (nprobe) and HNSW (efSearch) indexes
+    options = []
+    for name in ("nprobe", "ef_search"):
+        value = args.get(name)
+        if value is None:
+            options.append(None)
+            continue
+        value = int(value)
+        if value < 1:
+            raise ValueError(f"'{name}' must be positive.")
+        options.append(value)
+    return tuple(options) if any(options) else None
+
+def scoring(args):
+    value = args.get("scoring", PASSAGE_SCORING)
+    if value not in ("max", "sum"):
+        raise ValueError("'scoring' must be 'max' or 'sum'.")
+    return value
+
+def mode(args):
+    value = args.get("mode", SEARCH_MODE)
+    if value not in SEARCH_MODES:
+        raise ValueError("'mode' must be 'dense', 'lexical' or 'hybrid'.")
+    return value
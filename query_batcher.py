@@ -0,0 +1,84 @@
+# ✅ query_batcher.py – Micro-Batched Encode + Search for Concurrent Queries
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from metrics import INDEX_SEARCH, QUERY_ENCODE
+
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", 5))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", 32))
+
+# 🚦 Coalesce concurrent questions into one encode + one index.search
+# `source` is whatever the caller searches against (a snapshot); get_index / plan receive it, and
+# plan(source, options) returns the (index, search params) a group of questions with those options runs on
+class QueryBatcher:
+    def __init__(self, encode, get_index, window_ms=QUERY_BATCH_WINDOW_MS, max_batch=QUERY_BATCH_MAX_SIZE, plan=None):
+        self.encode = encode
+        self.get_index = get_index
+        self.plan = plan
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def submit(self, question, k, options=None, source=None):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((question, k, options, source, future))
+        return future
+
+    def search(self, question, k, timeout=None, options=None, source=None):
+        """Blocks until this question's batch ran; returns (distances, ids) rows."""
+        return self.submit(question, k, options, source).result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Questions with different search knobs (nprobe/efSearch) or snapshots can't share a search call
+            groups = {}
+            for entry in batch:
+                groups.setdefault((entry[2], id(entry[3])), []).append(entry)
+            for group in groups.values():
+                self._dispatch(group)
+
+    def search_batch(self, questions, k, options=None, source=None):
+        """Synchronous path for callers that already hold a batch."""
+        index = self.get_index(source)
+        if index is None:
+            raise RuntimeError("FAISS index not loaded")
+        with QUERY_ENCODE.time():
+            vectors = np.asarray(self.encode(list(questions)), dtype="float32")
+        params = None
+        if options and self.plan:
+            index, params = self.plan(source, options)
+        with INDEX_SEARCH.time():
+            return index.search(vectors, k, params=params)
+
+    def _dispatch(self, batch):
+        try:
+            _, _, options, source, _ = batch[0]
+            D, I = self.search_batch([q for q, _, _, _, _ in batch], max(k for _, k, _, _, _ in batch), options, source)
+            for row, (_, k, _, _, future) in enumerate(batch):
+                future.set_result((D[row, :k], I[row, :k]))
+        except Exception as e:
+            for _, _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,88 @@
+# ✅ query_cache.py – LRU/TTL Caches for Query Embeddings and Results
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 3600))
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+# 🗃️ Bounded, thread-safe LRU with per-entry expiry
+class LRUCache:
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+# 🧠 question → embedding, (question, top_k, filter, index_version, search knobs) → payload
+class QueryCache:
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.embeddings = LRUCache(maxsize, ttl)
+        self.results = LRUCache(maxsize, ttl)
+        self.version = None
+
+    def cached_encoder(self, encode):
+        def encode_with_cache(questions):
+            keys = [normalize_question(q) for q in questions]
+            vectors = [self.embeddings.get(k) for k in keys]
+            missing = {k: q for k, q, v in zip(keys, questions, vectors) if v is None}
+            if missing:
+                fresh = np.asarray(encode(list(missing.values())), dtype="float32")
+                for k, v in zip(missing, fresh):
+                    self.embeddings.put(k, v)
+                lookup = dict(zip(missing, fresh))
+                vectors = [lookup[k] if v is None else v for k, v in zip(keys, vectors)]
+            return np.vstack(vectors)
+        return encode_with_cache
+
+    def _check_version(self, version):
+        # A new index version makes every stored payload stale; queries still on an
+        # older snapshot just miss (their version is part of the key) without flushing
+        if self.version is None or version > self.version:
+            self.results.clear()
+            self.version = version
+
+    def get_result(self, question, top_k, file_filter, version, options=None):
+        self._check_version(version)
+        return self.results.get((normalize_question(question), top_k, file_filter, version, options))
+
+    def put_result(self, question, top_k, file_filter, version, payload, options=None):
+        self._check_version(version)
+        self.results.put((normalize_question(question), top_k, file_filter, version, options), payload)
+
+    def stats(self):
+        return {"index_version": self.version, "embedding": self.embeddings.stats(), "result": self.results.stats()}
@@ -1,45 +1,70 @@
 # ✅ Ultimate SalesBOT Script – Boot-Safe + Drive Integrated (Enhanced + Observable)
-from flask import Flask, request, jsonify
-import threading
+from flask import Flask, Response, request, jsonify
+import json
 import os
 import subprocess
 import time
 from waitress import serve
 from datetime import datetime
 
+import shared
 from shared import (
-    model, index, knowledge_base, rebuild_faiss, log_memory,
+    model, knowledge_base, rebuild_faiss, log_memory,
     processed_files, processing_status
 )
-from sort_drive import run_drive_processing
-import numpy as np
+from sort_drive import drive_jobs
+from query_batcher import QueryBatcher
+from query_cache import QueryCache
+from passages import PASSAGE_OVERFETCH, PASSAGE_SCORING, aggregate_hits
+from lexical import SEARCH_MODE, rrf_fuse
+import query_args
+import metrics
 
 app = Flask(__name__)
+metrics.track_requests(app)
+
+# 📸 Serve the newest on-disk generation while Drive ingestion (in any worker) builds the next one;
+# the encoder warms up in the background and /ready flips once both are in place
+shared.start_serving()
+
+# 🚦 Concurrent /query calls share one encode + index.search; repeats hit the caches
+query_cache = QueryCache()
+query_batcher = QueryBatcher(
+    query_cache.cached_encoder(lambda questions: model.encode(questions, convert_to_numpy=True)),
+    lambda snap: snap.index,
+    plan=lambda snap, options: snap.search_plan(*options)
+)
+
+# 📦 /query/batch limits
+QUERY_BATCH_LIMIT = int(os.getenv("QUERY_BATCH_LIMIT", 1000))
+QUERY_BATCH_STREAM_THRESHOLD = int(os.getenv("QUERY_BATCH_STREAM_THRESHOLD", 50))
+LEXICAL_DEPTH = 4  # BM25 candidates per requested doc (feeds RRF)
+BOOT_SYNC_DELAY = float(os.getenv("BOOT_SYNC_DELAY", 30))  # seconds after boot before the incremental Drive sync
 
 def kill_existing_processes():
     subprocess.run(["pkill", "-f", "gunicorn"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     subprocess.run(["pkill", "-f", "waitress"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     time.sleep(2)
 
-def launch_drive_sort():
-    if not processing_status.get("boot_triggered"):
-        print("🚀 Launching Drive processing thread...")
+def launch_drive_sort(delay=BOOT_SYNC_DELAY):
+    # Incremental sync (Drive change feed) in the background, after the server is already answering
+    # (an ingestion job interrupted by the last shutdown resumes from its checkpoint)
+    if not processing_status.get("boot_triggered") and drive_jobs.submit(delay=delay):
+        print(f"🚀 Drive processing scheduled in {delay:.0f}s...")
         processing_status["boot_triggered"] = True
-        threading.Thread(target=run_drive_processing, daemon=True).start()
 
-def wait_for_index(timeout=60):
-    print("⏳ Waiting for FAISS index...")
-    start = time.time()
-    while index is None and time.time() - start < timeout:
-        time.sleep(1)
-    if index is None:
-        print("⚠️ Timeout: FAISS index did not initialize.")
+# 📸 File names in the newest published generation: whichever worker built it, unlike this worker's
+# writer-side knowledge_base, which is only current in the worker that last wrote
+def _served_files():
+    shared.refresh_snapshot()
+    snap = shared.snapshots.current
+    return list(snap.docs.ids) if snap is not None else []
 
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({
         "status": "SalesBOT is live",
-        "sorted_files": len(knowledge_base),
+        "sorted_files": len(_served_files()),
         "memory_MB": log_memory(),
         "last_run": processing_status.get("last_run"),
         "running": processing_status["running"]
@@ -49,9 +74,26 @@ def home():
 def health_check():
     return jsonify({"status": "ok", "memory_MB": log_memory()})
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    snap = shared.snapshots.current
+    body = {
+        "ready": shared.ready.is_set(),
+        "index": snap is not None,
+        "generation": snap.version if snap is not None else None,
+        "encoder": shared.model.loaded,
+        "startup_s": shared.startup
+    }
+    return jsonify(body), 200 if body["ready"] else 503
+
+# 📊 Prometheus scrape endpoint: latency histograms, ingestion timings, Drive counters, index/RSS gauges
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route("/status", methods=["GET"])
 def status():
-    return jsonify(processing_status)
+    return jsonify(dict(processing_status, job=drive_jobs.status()))
 
 @app.route("/debug", methods=["GET"])
 def debug():
@@ -60,8 +102,12 @@ def debug():
         "running": processing_status["running"],
         "boot_triggered": processing_status["boot_triggered"],
         "log_entries": len(processing_status.get("log", {})),
-        "indexed_files": len(knowledge_base),
-        "memory_MB": log_memory()
+        "indexed_files": len(_served_files()),
+        "memory_MB": log_memory(),
+        "index": shared.snapshots.params(),
+        "snapshots": shared.snapshots.stats(),
+        "lexical_docs": len(shared.lexical_index),
+        "query_cache": query_cache.stats()
     })
 
 @app.route("/mem", methods=["GET"])
@@ -70,45 +116,178 @@ def memory_status():
 
 @app.route("/files", methods=["GET"])
 def list_indexed_files():
-    return jsonify({"files": list(knowledge_base.keys())})
+    return jsonify({"files": _served_files()})
 
 @app.route("/process_drive", methods=["POST"])
 def process_drive():
-    if processing_status["running"]:
+    full = request.args.get("full") == "1"
+    if not drive_jobs.submit(full=full):
         return jsonify({"message": "Drive processing is already running."}), 429
-    threading.Thread(target=run_drive_processing, daemon=True).start()
-    return jsonify({"message": "Drive processing started."}), 202
+    return jsonify({"message": "Drive processing started.", "full_scan": full}), 202
+
+def _not_ready(snap):
+    # Drive processing no longer blocks queries: they read the last published snapshot
+    if snap is None or not len(snap):
+        return jsonify({
+            "error": "System is initializing. Please wait.",
+            "stage": processing_status["stage"],
+            "last_run": processing_status.get("last_run")
+        }), 503
+    return None
+
+def _with_filters(options, filters):
+    # Batcher options: (nprobe, ef_search, filters), see Snapshot.search_plan
+    if not filters:
+        return options + (None,) if options else None
+    return (options or (None, None)) + (filters,)
+
+def _ranked_docs(distances, ids, scoring=PASSAGE_SCORING):
+    # Passage hits → doc ids, best first (filters and top_k apply afterwards)
+    return [doc_id for doc_id, _, _ in aggregate_hits(distances, ids, len(ids), scoring)]
+
+def _lexical_docs(snap, question, depth, filters=None):
+    allowed = snap.meta.mask(dict(filters)) if filters else None
+    return [doc_id for doc_id, _ in snap.lexical.search(question, depth, allowed)]
+
+def _combine(dense, lexical, mode):
+    if mode == "dense":
+        return dense
+    if mode == "lexical":
+        return lexical
+    return [doc_id for doc_id, _ in rrf_fuse([dense, lexical])]
+
+def _format_hits(snap, ids, top_k=5):
+    results = []
+    for doc in snap.docs.lookup(ids):
+        if doc is None:
+            continue
+        results.append({
+            "source": doc["name"],
+            "file_type": doc["ext"],
+            "insight": snap.texts.text(doc["id"], limit=2000)[:500] + "..."
+        })
+        if len(results) == top_k:
+            break
+    return results
 
 @app.route("/query")
 def query():
     question = request.args.get("question")
     if not question:
         return jsonify({"error": "No question provided."}), 400
-    if processing_status["running"] or index is None or not knowledge_base:
-        return jsonify({
-            "error": "System is initializing or processing Drive. Please wait.",
-            "stage": processing_status["stage"],
-            "last_run": processing_status.get("last_run")
-        }), 503
     try:
-        query_embedding = model.encode([question], convert_to_numpy=True).astype("float32")
-        D, I = index.search(query_embedding, 5)  # You can increase this for more results
-        keys = list(knowledge_base.keys())
-        results = []
-        for idx in I[0]:
-            if idx == -1 or idx >= len(keys):
-                continue
-            results.append({
-                "source": keys[idx],
-                "insight": knowledge_base[keys[idx]][:500] + "..."
-            })
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": f"Query failed: {str(e)}"}), 500
+        options = query_args.search_options(request.args)
+        scoring = query_args.scoring(request.args)
+        mode = query_args.mode(request.args)
+        filters = query_args.filters(request.args)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    shared.refresh_snapshot()
+    with shared.snapshots.reading() as snap:
+        busy = _not_ready(snap)
+        if busy:
+            return busy
+        try:
+            key = (options, scoring, mode)
+            cached = query_cache.get_result(question, 5, filters, snap.version, key)
+            if cached is not None:
+                return jsonify(cached)
+            results = []
+            if not filters or snap.filter_selector(filters) is not None:
+                dense = lexical = []
+                if mode != "lexical":
+                    # Several passages of one doc can rank together, so fetch enough to fill 5 docs
+                    D, I = query_batcher.search(question, 5 * PASSAGE_OVERFETCH, options=_with_filters(options, filters),
+                                                source=snap)
+                    dense = _ranked_docs(D, I, scoring)
+                if mode != "dense":
+                    lexical = _lexical_docs(snap, question, 5 * LEXICAL_DEPTH, filters)
+                results = _format_hits(snap, _combine(dense, lexical, mode))
+            query_cache.put_result(question, 5, filters, snap.version, results, key)
+            return jsonify(results)
+        except Exception as e:
+            return jsonify({"error": f"Query failed: {str(e)}"}), 500
+
+def _parse_batch(payload):
+    items = payload.get("questions") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise ValueError("Expected a non-empty JSON list of questions.")
+    if len(items) > QUERY_BATCH_LIMIT:
+        raise ValueError(f"Batch too large (max {QUERY_BATCH_LIMIT}).")
+    parsed = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"question": item}
+        if not isinstance(item, dict) or not isinstance(item.get("question"), str) or not item["question"].strip():
+            raise ValueError("Each entry needs a non-empty 'question'.")
+        top_k = int(item.get("top_k", 5))
+        if top_k < 1:
+            raise ValueError("'top_k' must be positive.")
+        parsed.append((item["question"], top_k, query_args.filters(item)))
+    return parsed
+
+def _run_batch(snap, items, options=None, scoring=PASSAGE_SCORING, mode=SEARCH_MODE):
+    # One encode + one pre-filtered index.search per distinct filter in the slice
+    answers = [None] * len(items)
+    groups = {}
+    for row, (_, _, filters) in enumerate(items):
+        groups.setdefault(filters, []).append(row)
+    for filters, rows in groups.items():
+        questions = [items[row][0] for row in rows]
+        if filters and snap.filter_selector(filters) is None:
+            for row in rows:
+                answers[row] = {"question": items[row][0], "results": []}
+            continue
+        if mode != "lexical":
+            k = max(items[row][1] for row in rows) * PASSAGE_OVERFETCH
+            D, I = query_batcher.search_batch(questions, min(k, snap.index.ntotal) or 1, _with_filters(options, filters), snap)
+        for i, row in enumerate(rows):
+            q, top_k, _ = items[row]
+            dense = _ranked_docs(D[i], I[i], scoring) if mode != "lexical" else []
+            lexical = _lexical_docs(snap, q, top_k * LEXICAL_DEPTH, filters) if mode != "dense" else []
+            answers[row] = {"question": q, "results": _format_hits(snap, _combine(dense, lexical, mode), top_k)}
+    return answers
+
+@app.route("/query/batch", methods=["POST"])
+def query_batch():
+    try:
+        items = _parse_batch(request.get_json(silent=True))
+        options = query_args.search_options(request.args)
+        scoring = query_args.scoring(request.args)
+        mode = query_args.mode(request.args)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    shared.refresh_snapshot()
+    busy = _not_ready(shared.snapshots.current)
+    if busy:
+        return busy
+
+    stream = len(items) > QUERY_BATCH_STREAM_THRESHOLD or "application/x-ndjson" in request.headers.get("Accept", "")
+    if not stream:
+        with shared.snapshots.reading() as snap:
+            try:
+                return jsonify(_run_batch(snap, items, options, scoring, mode))
+            except Exception as e:
+                return jsonify({"error": f"Query failed: {str(e)}"}), 500
+
+    def generate():
+        # Encode chunk by chunk so memory stays flat however large the batch is; the whole
+        # stream answers from the snapshot that was current when it started
+        step = query_batcher.max_batch
+        with shared.snapshots.reading() as snap:
+            for start in range(0, len(items), step):
+                try:
+                    answers = _run_batch(snap, items[start:start + step], options, scoring, mode)
+                except Exception as e:
+                    answers = [{"question": q, "error": f"Query failed: {str(e)}"} for q, _, _ in items[start:start + step]]
+                for offset, answer in enumerate(answers):
+                    yield json.dumps(dict(answer, index=start + offset)) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
 
 @app.route("/reload_index", methods=["POST"])
 def reload_index():
-    if not knowledge_base:
+    if not _served_files() and not knowledge_base:  # rebuild_faiss reloads the writer state itself
         return jsonify({"error": "Knowledge base is empty. Rebuild aborted."}), 400
     try:
         rebuild_faiss()
@@ -128,7 +307,10 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 10000))
     print(f"\n\n🚀 Booting SalesBOT on port {port}\n")
     kill_existing_processes()
-    with app.app_context():
-        launch_drive_sort()
-        wait_for_index()
+    snap = shared.snapshots.current
+    if snap is not None:
+        print(f"✅ Serving generation {snap.version} ({len(snap)} files) after {shared.startup['snapshot_s']}s")
+    else:
+        print("⚠️ No persisted index yet: /query returns 503 until the first Drive sync publishes one")
+    launch_drive_sort()
     serve(app, host="0.0.0.0", port=port)
@@ -1,14 +1,26 @@
 # ✅ shared.py – Runtime State, Safe Indexing, File Deduplication
 import faiss
 import numpy as np
-import hashlib
 import json
 import os
 import gc
+import threading
+import time
 import psutil
-from sentence_transformers import SentenceTransformer
-import fitz  # PyMuPDF
-import docx
+from encoder import LazyEncoder
+from embeddings import EMBED_BATCH_SIZE, EmbeddingCache, content_hash, embed_texts
+from doc_table import DocTable
+from kb_store import KnowledgeStore
+from passages import PASSAGE_DTYPE, PASSAGE_ID_BITS, PassageStore, iter_doc_passages
+from lexical import LexicalBuilder, LexicalIndex
+from doc_meta import DocMeta
+from snapshot import Snapshot, SnapshotManager
+from index_store import INDEX_ROOT, GenerationWatcher, WriterLock, generation_dir, publish_generation, read_manifest
+from index_factory import (
+    INDEX_FORMAT, INDEX_MMAP_FLAGS, RECALL_SAMPLE, IndexBuilder, choose_kind, describe_index, index_ids, index_params_path, layout,
+    load_params, load_transform, read_header, save_transform, supports_removal, write_index_file
+)
+from metrics import FILE_EMBED, INDEX_BYTES, INDEX_DOCS, INDEX_VECTORS
 
 # 🔧 Runtime status
 processing_status = {
@@ -20,11 +32,40 @@ processing_status = {
     "boot_triggered": False
 }
 
-# 🧠 Embedding engine
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# 🧠 Embedding engine (ENCODER_BACKEND=torch|onnx), loaded on first encode or by the background warm-up
+model = LazyEncoder()
 index = None
-knowledge_base = {}
+index_path = "ai_search_index.faiss"
+index_params = {}
+index_lock = WriterLock()  # serialises writers across threads and workers; queries read snapshots instead
+index_version = 0  # generation number of the snapshot this worker serves
 file_hashes = set()
+embedding_cache = EmbeddingCache()
+
+# 📇 Doc table (FAISS id → source name, file type, text offset) + mmap text blob
+doc_table = DocTable()
+knowledge_base = KnowledgeStore(doc_table)
+
+# 🧩 Passage spans (FAISS indexes passages; ids map back to docs)
+passage_store = PassageStore()
+PASSAGE_EMBED_CHUNK = EMBED_BATCH_SIZE * 8
+
+# 🔤 BM25 postings for exact names / product codes (no model needed at query time)
+lexical_index = LexicalIndex()
+
+# 🗂️ Columnar doc metadata for pre-filtered search (type, category, Drive folder, modified)
+doc_meta = DocMeta()
+
+# 📸 Queries pin the current snapshot; writers build the next one and publish it atomically
+snapshots = SnapshotManager()
+generation_watcher = GenerationWatcher()
+_reload_lock = threading.Lock()
+
+# 📐 /metrics gauges read whatever snapshot is served at scrape time
+INDEX_VECTORS.track(lambda: snapshots.current.index.ntotal if snapshots.current else None)
+INDEX_DOCS.track(lambda: len(snapshots.current) if snapshots.current else None)
+INDEX_BYTES.track(lambda: os.path.getsize(
+    os.path.join(generation_dir(snapshots.current.version), os.path.basename(index_path))) if snapshots.current else None)
 
 # ✅ Load prior processed files
 processed_files_path = "processed_files.json"
@@ -37,17 +78,15 @@ if os.path.exists(processed_files_path):
         processing_status["stage"] = f"Failed to load processed_files.json: {e}"
         processed_files = set()
 
-# ✅ Load vector knowledge base
-if os.path.exists("ai_metadata.npy"):
-    try:
-        kb = np.load("ai_metadata.npy", allow_pickle=True).item()
-        if isinstance(kb, dict):
-            knowledge_base.update(kb)
-        else:
-            raise ValueError("ai_metadata.npy did not contain a dictionary")
-    except Exception as e:
-        processing_status["stage"] = f"Metadata load failed: {e}"
-        knowledge_base = {}
+# ✅ Rebuild lexical postings if they don't cover the doc table (first run, crash mid-update)
+def _sync_lexical():
+    if np.array_equal(lexical_index.doc_ids(), np.sort(doc_table.live_ids())):
+        return
+    builder = LexicalBuilder()
+    for doc_id in doc_table.live_ids():
+        builder.add(int(doc_id), knowledge_base.text(doc_id))
+    lexical_index.install(builder)
+    lexical_index.save()
 
 # 📁 Extension routing
 EXTENSION_MAP = {
@@ -75,49 +114,348 @@ BASE_FOLDERS = set([
     "System_Files", "Quarantine"
 ])
 
+def _meta_row(name, extra=None):
+    ext = os.path.splitext(name)[-1].lower()
+    return dict({"ext": ext, "category": EXTENSION_MAP.get(ext, "Miscellaneous")}, **(extra or {}))
+
+# ✅ Backfill metadata derivable from names for docs indexed before the side table existed
+def _backfill_meta():
+    live_ids = doc_table.live_ids()
+    missing = live_ids[~doc_meta.has(live_ids)]
+    if len(missing):
+        doc_meta.update({doc["id"]: _meta_row(doc["name"]) for doc in doc_table.lookup(missing)})
+        doc_meta.save()
+
+# Writer state above was read from the top-level files, which match the newest generation
+_writer_generation = (read_manifest() or {}).get("generation", 0)
+_writer_prepared = False
+
+# 🛠️ One-time writer upkeep, deferred from import so serving workers never pay for it
+def _prepare_writer():
+    global _writer_prepared
+    if _writer_prepared:
+        return
+    _writer_prepared = True
+    try:
+        knowledge_base.migrate_legacy()  # legacy pickled knowledge base, imported once
+    except Exception as e:
+        processing_status["stage"] = f"Metadata load failed: {e}"
+    try:
+        _sync_lexical()
+    except Exception as e:
+        processing_status["stage"] = f"Lexical index load failed: {e}"
+    _backfill_meta()
+
+# 🚦 Ready = a published snapshot to search + a warm encoder; timings are seconds since process start
+ready = threading.Event()
+startup = {"snapshot_s": None, "encoder_s": None, "ready_s": None}
+
+def _mark_startup(step):
+    elapsed = round(time.time() - psutil.Process(os.getpid()).create_time(), 2)
+    if startup[step] is None:
+        startup[step] = elapsed
+    if not ready.is_set() and startup["snapshot_s"] is not None and startup["encoder_s"] is not None:
+        startup["ready_s"] = elapsed
+        ready.set()
+
+def warm_up_encoder():
+    try:
+        model.warm_up()
+        _mark_startup("encoder_s")
+    except Exception as e:
+        processing_status["stage"] = f"Encoder warm-up failed: {e}"
+
+# 🆔 Index helpers
+def load_index():
+    # Only an index holding exactly the passage table's passages for the doc table's ids can be patched in place
+    global index, index_params
+    if index is not None:
+        return index
+    if not os.path.exists(index_path):
+        return None
+    try:
+        header = read_header(index_path)
+        if header is not None and header.get("format", 0) > INDEX_FORMAT:
+            return None  # written by a newer version; rebuild rather than misread it
+        loaded = faiss.read_index(index_path)
+    except Exception:
+        return None
+    stored = index_ids(loaded)
+    if stored is not None and len(stored) == len(passage_store):
+        if np.array_equal(np.unique(stored >> PASSAGE_ID_BITS), np.sort(doc_table.live_ids())):
+            index = loaded
+            if header is None:
+                # Format 1 (bare faiss file + params JSON): migrate in place by rewriting with a header
+                index_params = dict(describe_index(loaded), **(load_params() or {}))
+                _save_index()
+                if os.path.exists(index_params_path):
+                    os.remove(index_params_path)
+            else:
+                index_params = header
+    return index
+
+def _save_index():
+    write_index_file(index, dict(index_params, ntotal=int(index.ntotal)), index_path)
+
+def _remove_vectors(ids):
+    # HNSW graphs cannot drop vectors; callers rebuild instead
+    if not supports_removal(index_params):
+        return False
+    index.remove_ids(np.asarray(ids, dtype="int64"))
+    return True
+
+def _outgrown():
+    # Corpus crossed a size threshold, or storage / PCA config changed, since the last build → retrain
+    if choose_kind(index.ntotal) != index_params.get("kind"):
+        return True
+    wanted = layout(index_params.get("dim", index.d))
+    return any(index_params.get(key) != value for key, value in wanted.items())
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _passage_rows(batch):
+    return np.array([(doc_id, offset, length) for doc_id, _, offset, length, _ in batch], dtype=PASSAGE_DTYPE)
+
+def _add_passages(docs):
+    # Chunk → embed → add, one bounded batch at a time; `docs` yields (doc_id, text)
+    chunks, spent = [], {}
+    for batch in _batched(iter_doc_passages(docs), PASSAGE_EMBED_CHUNK):
+        pids = np.array([(doc_id << PASSAGE_ID_BITS) | j for doc_id, j, _, _, _ in batch], dtype="int64")
+        start = time.perf_counter()
+        index.add_with_ids(embed_texts(model, [p[4] for p in batch], embedding_cache), pids)
+        # A batch spans several docs: each is charged its share of passages
+        share = (time.perf_counter() - start) / len(batch)
+        for doc_id, _, _, _, _ in batch:
+            spent[doc_id] = spent.get(doc_id, 0.0) + share
+        chunks.append(_passage_rows(batch))
+    passage_store.append(chunks)
+    embedding_cache.save()
+    for doc_id, seconds in spent.items():
+        FILE_EMBED.observe(seconds, ext=str(doc_table.rows[doc_id]["ext"]) or ".unknown")
+
+def _generation_files():
+    paths = (index_path, doc_table.path, knowledge_base.path, passage_store.table_path, lexical_index.path, doc_meta.path)
+    return {os.path.basename(path): path for path in paths}
+
+def _publish():
+    # Link the saved files into a new on-disk generation (other workers reload it), then serve it here
+    # the same way, mapped from disk: the writer keeps mutating its private index without copying it
+    global index_version, _writer_generation
+    manifest = publish_generation(_generation_files(), {"index": {"kind": index_params.get("kind"), "ntotal": int(index.ntotal)}})
+    index_version = _writer_generation = manifest["generation"]
+    snapshots.publish(_load_generation(manifest))
+    _mark_startup("snapshot_s")
+
+def _sync_writer():
+    # Another worker published since this one last wrote: reload the writer state it left on disk
+    global index, _writer_generation
+    generation = (read_manifest() or {}).get("generation", 0)
+    if generation <= _writer_generation:
+        _prepare_writer()
+        return
+    doc_table.load()
+    knowledge_base.close()
+    passage_store.load()
+    lexical_index.load()
+    doc_meta.load()
+    embedding_cache.load()
+    index = None  # load_index() picks up the matching index file
+    _writer_generation = generation
+    _prepare_writer()
+
+# 📥 Snapshot straight from a generation directory: index mapped in place (never written again, each write is a
+# new file), tables mmap'd, so workers share pages
+def _load_generation(manifest):
+    base = os.path.join(INDEX_ROOT, manifest["dir"])
+    at = lambda path: os.path.join(base, os.path.basename(path))
+    loaded = faiss.read_index(at(index_path), INDEX_MMAP_FLAGS)
+    docs = DocTable(at(doc_table.path))
+    texts = KnowledgeStore(docs, at(knowledge_base.path))
+    texts.pin()
+    return Snapshot(
+        manifest["generation"], loaded, read_header(at(index_path)) or describe_index(loaded), docs, texts,
+        PassageStore(at(passage_store.table_path)), LexicalIndex(at(lexical_index.path)), DocMeta(at(doc_meta.path))
+    )
+
+def _adopt_generation(manifest):
+    global index_version
+    try:
+        snapshot = _load_generation(manifest)
+        if snapshots.publish(snapshot):
+            index_version = max(index_version, snapshot.version)
+            _mark_startup("snapshot_s")
+    except Exception as e:
+        generation_watcher.reset()  # retry on the next poll
+        processing_status["stage"] = f"Generation {manifest.get('generation')} reload failed: {e}"
+    finally:
+        _reload_lock.release()
+
+# 🔄 Per-request generation check (one stat() per INDEX_POLL_SECONDS); the reload runs off the request path
+def refresh_snapshot(force=False):
+    manifest = generation_watcher.poll(force)
+    if manifest is None or manifest.get("generation", 0) <= index_version:
+        return
+    if not _reload_lock.acquire(blocking=False):
+        return  # another thread is already loading it
+    if force:
+        _adopt_generation(manifest)
+    else:
+        threading.Thread(target=_adopt_generation, args=(manifest,), daemon=True).start()
+
+# 🚀 Serve the newest generation (mmap'd, no model needed) and warm the encoder in the background;
+# a first run with only top-level files publishes them as generation 1
+def start_serving(warm=True):
+    if snapshots.current is None and read_manifest() is None:
+        with index_lock:
+            if read_manifest() is None:
+                _prepare_writer()
+                if load_index() is not None:
+                    _publish()
+    refresh_snapshot(force=True)
+    if warm and not model.loaded:
+        threading.Thread(target=warm_up_encoder, daemon=True).start()
+
+def _record_meta(docs, meta, stale):
+    doc_meta.clear(stale)
+    doc_meta.update({
+        doc_table.get_id(name): _meta_row(name, (meta or {}).get(name))
+        for name in docs if name in knowledge_base
+    })
+    doc_meta.save()
+
 # 🔁 FAISS index rebuild
 def rebuild_faiss():
-    global index
+    global index, index_params
     try:
-        valid_texts = [v for v in knowledge_base.values() if isinstance(v, str) and v.strip()]
-        if not valid_texts:
-            processing_status["stage"] = "FAISS rebuild skipped (no valid text entries)"
-            return
-        embeddings = [
-            model.encode([t], convert_to_numpy=True)[0].astype("float32")
-            for t in valid_texts
-        ]
-        dim = len(embeddings[0])
-        index = faiss.IndexFlatL2(dim)
-        index.add(np.array(embeddings))
-        faiss.write_index(index, "ai_search_index.faiss")
-        processing_status["stage"] = f"FAISS rebuilt with {len(embeddings)} entries"
+        with index_lock:
+            _sync_writer()
+            if not knowledge_base:
+                processing_status["stage"] = "FAISS rebuild skipped (no valid text entries)"
+                return
+            knowledge_base.compact()
+            # Pass 1: passage spans + lexical postings, so the corpus is sized before anything is embedded
+            lexical = LexicalBuilder()
+
+            def live_docs():
+                for doc_id in np.sort(doc_table.live_ids()):
+                    text = knowledge_base.text(doc_id)
+                    lexical.add(int(doc_id), text)
+                    yield int(doc_id), text
+
+            passage_store.clear()
+            passage_store.append([
+                _passage_rows(batch) for batch in _batched(iter_doc_passages(live_docs()), PASSAGE_EMBED_CHUNK)
+            ])
+            lexical_index.install(lexical)
+            lexical_index.save()
+            n, rows, pids = len(passage_store), passage_store.rows, passage_store.row_ids()
+
+            def texts_at(positions):
+                return [knowledge_base.slice(int(r["doc_id"]), int(r["offset"]), int(r["length"])) for r in rows[positions]]
+
+            dim = model.get_sentence_embedding_dimension()
+            transform, version = load_transform(dim)
+            builder = IndexBuilder(n, dim, transform=transform, transform_version=version)
+            rng = np.random.default_rng(0)
+            if builder.needs_training:
+                train = np.sort(rng.choice(n, size=builder.train_size(n), replace=False))
+                builder.train(embed_texts(model, texts_at(train), embedding_cache))
+            probes = np.sort(rng.choice(n, size=min(RECALL_SAMPLE, n), replace=False))
+            builder.track_recall(embed_texts(model, texts_at(probes), embedding_cache))
+
+            # Pass 2: embed + add in bounded slices
+            live_hashes = set()
+            for start in range(0, n, PASSAGE_EMBED_CHUNK):
+                positions = np.arange(start, min(start + PASSAGE_EMBED_CHUNK, n))
+                texts = texts_at(positions)
+                live_hashes.update(content_hash(t) for t in texts)
+                builder.add(embed_texts(model, texts, embedding_cache), pids[positions])
+            embedding_cache.prune(live_hashes)
+            embedding_cache.save()
+            index, index_params = builder.finish()
+            if builder.transform is not None and not builder.reused_transform:
+                save_transform(builder.transform, index_params["transform"])
+            _save_index()
+            passage_store.save()
+            _publish()
+            recall = index_params.get("recall")
+            processing_status["stage"] = f"FAISS rebuilt ({index_params['kind']}) with {n} passages from {len(knowledge_base)} docs" + (
+                f", recall@{recall['k']} {recall['recall']}" if recall else "")
     except Exception as e:
         processing_status["stage"] = f"FAISS rebuild failed: {e}"
     finally:
         gc.collect()
 
-# 📜 Extract readable content
-def extract_text(path, ext):
-    try:
-        if ext == ".pdf":
-            return " ".join([page.get_text() for page in fitz.open(path)])
-        elif ext == ".docx":
-            return " ".join([p.text for p in docx.Document(path).paragraphs])
-        elif ext in [".txt", ".md", ".html"]:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        elif ext == ".csv":
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-    except Exception:
-        return ""
-    return ""
+# ➕ Incremental add / replace
+def upsert_documents(docs, meta=None):
+    # `meta` optionally maps name → {"folder", "modified"} for filtered search
+    with index_lock:
+        _sync_writer()
+        stale = [doc_table.get_id(k) for k in docs if k in doc_table]
+        if load_index() is None:
+            knowledge_base.update(docs)
+            _record_meta(docs, meta, stale)
+            rebuild_faiss()
+            return
+        stale_pids = passage_store.ids(stale)
+        knowledge_base.update(docs)
+        _record_meta(docs, meta, stale)
+        passage_store.remove(stale)
+        if len(stale_pids) and not _remove_vectors(stale_pids):
+            rebuild_faiss()
+            return
+        valid = [k for k in docs if k in knowledge_base]
+        lexical_index.update({doc_table.get_id(k): docs[k] for k in valid}, removed=stale)
+        lexical_index.save()
+        _add_passages((doc_table.get_id(k), docs[k]) for k in valid)
+        passage_store.save()
+        if _outgrown():
+            rebuild_faiss()
+            return
+        _save_index()
+        _publish()
+        processing_status["stage"] = f"FAISS updated: {len(valid)} upserted, {index.ntotal} passages"
+
+# ➖ Incremental evict
+def remove_documents(names):
+    with index_lock:
+        _sync_writer()
+        names = [n for n in names if n in knowledge_base]
+        if not names:
+            return
+        live = load_index()
+        stale = knowledge_base.remove(names).tolist()
+        doc_meta.clear(stale)
+        doc_meta.save()
+        lexical_index.remove(stale)
+        lexical_index.save()
+        stale_pids = passage_store.ids(stale)
+        passage_store.remove(stale)
+        passage_store.save()
+        if live is None or not _remove_vectors(stale_pids):
+            rebuild_faiss()
+            return
+        _save_index()
+        _publish()
+        processing_status["stage"] = f"FAISS updated: {len(stale)} removed, {index.ntotal} passages"
 
 # 🔐 Duplication check
 def is_duplicate(content, filename):
-    h = hashlib.md5(content.encode("utf-8")).hexdigest()
-    return h in file_hashes or filename in processed_files
+    h = content_hash(content)
+    if h in file_hashes:
+        return True
+    if filename in doc_table:
+        # Same name with new text is a replacement, not a duplicate
+        return doc_table.get_hash(filename) == h
+    return filename in processed_files
 
 # 🧠 Memory logging
 def log_memory():
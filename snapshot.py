@@ -0,0 +1,128 @@
+# ✅ snapshot.py – Immutable Serving Snapshots (Atomic Swap + Reference Counting)
+import threading
+from contextlib import contextmanager
+import faiss
+from index_factory import FILTER_EXACT_MAX, exact_subindex, search_parameters
+
+SELECTOR_CACHE_SIZE = 64
+EXACT_CACHE_SIZE = 8  # flat copies of ≤ FILTER_EXACT_MAX vectors each, so far fewer of them
+
+# 📸 One published version of everything a query reads; ingestion never touches it after publish
+class Snapshot:
+    def __init__(self, version, index, params, docs, texts, passages, lexical, meta):
+        self.version = version
+        self.index = index          # FAISS index, mapped from the generation directory
+        self.params = params        # index params (kind, nprobe, storage, ...)
+        self.docs = docs            # DocTable over the generation's rows (mmap)
+        self.texts = texts          # KnowledgeStore over `docs`, blob mapped at load time
+        self.passages = passages    # PassageStore over the generation's passage table (mmap)
+        self.lexical = lexical      # LexicalIndex of the generation's postings
+        self.meta = meta            # DocMeta of the generation
+        self._selectors = {}
+        self._exact = {}
+        self._refs = 1              # held by the manager until the snapshot is replaced
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __len__(self):
+        return len(self.docs)
+
+    def acquire(self):
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            last = self._refs == 0
+        if last:
+            self.close()
+
+    def close(self):
+        # Last reader gone: unmap the text blob and drop every other mapping now, not at some later GC pass
+        self.closed = True
+        self.index = self.docs = self.passages = self.lexical = self.meta = None
+        self._selectors.clear()
+        self._exact.clear()
+        self.texts.close()
+
+    # 🎯 Passage ids and their IDSelector for a filter tuple ((column, value), ...); selector None when nothing matches
+    def _selection(self, filters):
+        cached = self._selectors.get(filters)
+        if cached is None:
+            pids = self.passages.ids(self.meta.select(dict(filters)).tolist())
+            cached = (pids, faiss.IDSelectorBatch(pids) if len(pids) else None)
+            if len(self._selectors) >= SELECTOR_CACHE_SIZE:
+                self._selectors.clear()
+            self._selectors[filters] = cached
+        return cached
+
+    def filter_selector(self, filters):
+        return self._selection(filters)[1]
+
+    # 🔍 (index, search params) for queries sharing (nprobe, ef_search, filters). Filtered HNSW queries over a
+    # small selection run on an exact copy of just those vectors; IVF widens its probing (search_parameters)
+    def search_plan(self, nprobe=None, ef_search=None, filters=None):
+        if not filters:
+            return self.index, search_parameters(self.params, nprobe, ef_search)
+        pids, sel = self._selection(filters)
+        if self.params.get("kind") == "hnsw" and 0 < len(pids) <= FILTER_EXACT_MAX:
+            exact = self._exact.get(filters)
+            if exact is None:
+                exact = exact_subindex(self.index, pids)
+                if len(self._exact) >= EXACT_CACHE_SIZE:
+                    self._exact.clear()
+                self._exact[filters] = exact
+            return exact, None
+        return self.index, search_parameters(self.params, nprobe, ef_search, sel, len(pids), self.index.ntotal)
+
+# 🔀 Holds the current snapshot; publish swaps it atomically, readers pin the one they started on
+class SnapshotManager:
+    def __init__(self):
+        self._current = None
+        self._lock = threading.Lock()
+        self._retired = []
+
+    @property
+    def current(self):
+        return self._current
+
+    def publish(self, snapshot):
+        # Never goes backwards: a slower reload of an older version is dropped
+        with self._lock:
+            old = self._current
+            stale = old is not None and snapshot.version <= old.version
+            if not stale:
+                self._current = snapshot
+                if old is not None:
+                    self._retired = [s for s in self._retired if not s.closed] + [old]
+        if stale:
+            snapshot.release()
+            return False
+        if old is not None:
+            old.release()  # in-flight queries keep it alive until they finish
+        return True
+
+    def acquire(self):
+        with self._lock:
+            return self._current.acquire() if self._current is not None else None
+
+    @contextmanager
+    def reading(self):
+        snapshot = self.acquire()
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                snapshot.release()
+
+    def params(self):
+        current = self._current
+        return current.params if current is not None else {}
+
+    def stats(self):
+        with self._lock:
+            current = self._current
+            retired = [s.version for s in self._retired if not s.closed]
+        return {"version": current.version if current is not None else None, "retired_in_use": retired}
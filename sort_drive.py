@@ -2,17 +2,32 @@
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from google.oauth2 import service_account
-import tempfile, hashlib, os, json, numpy as np
+import tempfile, os, io, json, queue, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from extraction import ExtractionService
 from shared import (
-    model, knowledge_base, index, rebuild_faiss, extract_text,
-    is_duplicate, log_memory, file_hashes, processed_files_path,
-    processed_files, EXTENSION_MAP, BASE_FOLDERS, processing_status
+    model, knowledge_base, upsert_documents, remove_documents,
+    is_duplicate, log_memory, file_hashes, content_hash, processed_files_path,
+    processed_files, EXTENSION_MAP, BASE_FOLDERS, processing_status, doc_table
 )
+from drive_batch import DriveBatcher
+from drive_tree import FolderTree
+from drive_sync import SyncManifest, FILE_FIELDS, FOLDER_MIME, execute, get_start_page_token, list_changes
+from metrics import DRIVE_CALLS, FILE_DOWNLOAD, FILE_EXTRACT, QUARANTINES
+from ingest_job import IngestJob, JobScheduler
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
+# ⚙️ Pipeline concurrency (downloads are I/O bound; extraction limits live in extraction.py)
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", 4))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 16))
+MAX_FILE_SIZE = 50 * 1024 * 1024
+DRIVE_SYNC_MODE = os.getenv("DRIVE_SYNC_MODE", "changes")  # "changes" or "full"
+INMEMORY_DOWNLOAD_LIMIT = int(os.getenv("INMEMORY_DOWNLOAD_LIMIT", 8 * 1024 * 1024))
+
 def authenticate_drive():
     try:
         json_data = os.getenv("SERVICE_ACCOUNT_JSON")
@@ -25,54 +40,68 @@ def authenticate_drive():
         processing_status["stage"] = f"Auth error: {e}"
         return None
 
-def ensure_folder(service, name):
-    results = service.files().list(
-        q=f"mimeType='application/vnd.google-apps.folder' and name='{name}' and 'root' in parents and trashed = false",
-        spaces='drive', fields="files(id, name)"
-    ).execute()
-    folders = results.get("files", [])
-    if folders:
-        return folders[0]['id']
+def ensure_folder(service, name, tree=None):
+    if tree is not None and tree.root_id:
+        folder_id = tree.find_folder(name)
+        if folder_id:
+            return folder_id
+    else:
+        results = execute(service.files().list(
+            q=f"mimeType='application/vnd.google-apps.folder' and name='{name}' and 'root' in parents and trashed = false",
+            spaces='drive', fields="files(id, name)"
+        ), "files.list")
+        folders = results.get("files", [])
+        if folders:
+            return folders[0]['id']
     folder_metadata = {'name': name, 'mimeType': 'application/vnd.google-apps.folder', 'parents': ['root']}
-    folder = service.files().create(body=folder_metadata, fields='id').execute()
+    folder = execute(service.files().create(body=folder_metadata, fields='id'), "files.create")
+    if tree is not None and tree.root_id:
+        tree.add({"id": folder['id'], "name": name, "mimeType": FOLDER_MIME, "parents": [tree.root_id]})
     return folder['id']
 
-def move_file(service, file_id, new_folder_id, move_log):
-    try:
-        file = service.files().get(fileId=file_id, fields='parents').execute()
-        previous_parents = ",".join(file.get('parents', [])) if file.get('parents') else ""
-        service.files().update(
-            fileId=file_id,
-            addParents=new_folder_id,
-            removeParents=previous_parents,
-            fields='id, parents'
-        ).execute()
-        move_log.append(file_id)
-        return True
-    except Exception as e:
-        processing_status['log'].setdefault("move_errors", []).append({"file_id": file_id, "error": str(e)})
-        return False
+def _needs_sorting(item, root_id):
+    # Same scope as the old root-only query: my root items, shared-with-me, my orphans
+    parents = item.get("parents") or []
+    owned = item.get("ownedByMe", True)
+    return (owned and root_id in parents) or bool(item.get("sharedWithMeTime")) or (owned and not parents)
+
+def source_folder(file, tree):
+    """Name of the Drive folder the file sat in before sorting moved it; None for parentless shared files."""
+    parents = file.get("parents") or []
+    if not parents:
+        return None
+    if parents[0] == tree.root_id:
+        return "My Drive"
+    entry = tree.items.get(parents[0])
+    return entry[0] if entry else None
 
-def get_all_files_iteratively(service):
+def get_all_files_iteratively(service, tree=None):
+    """One paginated pass over every live item: refreshes `tree` and returns what needs sorting."""
     all_files, folders, seen_ids = [], [], set()
+    tree = tree if tree is not None else FolderTree()
+    tree.clear()
+    tree.root_id = execute(service.files().get(fileId="root", fields="id"), "files.get")["id"]
     page_token = None
     while True:
-        # ✅ FINAL FIXED QUERY (Safe for Drive API)
-        response = service.files().list(
-            q="not trashed and (('me' in owners and 'root' in parents) or sharedWithMe = true or ('me' in owners and parents = ''))",
+        response = execute(service.files().list(
+            q="trashed = false",
             spaces='drive',
             corpora='user',
-            fields="nextPageToken, files(id, name, mimeType, size, parents)",
+            fields=f"nextPageToken, files({FILE_FIELDS}, ownedByMe, sharedWithMeTime)",
+            pageSize=1000,
             includeItemsFromAllDrives=True,
             supportsAllDrives=True,
             pageToken=page_token
-        ).execute()
+        ), "files.list")
 
         for item in response.get("files", []):
             if item['id'] in seen_ids:
                 continue
             seen_ids.add(item['id'])
-            if item['mimeType'] == 'application/vnd.google-apps.folder':
+            tree.add(item)
+            if not _needs_sorting(item, tree.root_id):
+                continue
+            if item['mimeType'] == FOLDER_MIME:
                 if item['name'] not in BASE_FOLDERS:
                     folders.append((item['id'], item['name']))
             else:
@@ -85,121 +114,332 @@ def get_all_files_iteratively(service):
     print(f"🔍 Found {len(all_files)} total files, {len(folders)} folders.")
     return all_files, folders
 
-def get_all_folders(service):
-    results = service.files().list(
-        q="mimeType='application/vnd.google-apps.folder' and trashed = false",
-        spaces='drive',
-        fields="files(id, name)"
-    ).execute()
-    return [(f["id"], f["name"]) for f in results.get("files", [])]
-
-def run_drive_processing():
-    global index
-    processing_status.update({"running": True, "stage": "Starting cleanup", "log": {}})
+# 📥 Drive clients are not thread-safe, so each download thread builds its own
+_thread_state = threading.local()
+
+def _thread_service(creds):
+    if getattr(_thread_state, "service", None) is None:
+        _thread_state.service = build("drive", "v3", credentials=creds)
+    return _thread_state.service
+
+def _thread_buffer():
+    # One reusable in-memory buffer per download thread
+    if getattr(_thread_state, "buffer", None) is None:
+        _thread_state.buffer = io.BytesIO()
+    _thread_state.buffer.seek(0)
+    _thread_state.buffer.truncate(0)
+    return _thread_state.buffer
+
+def _fetch(request, fd):
+    downloader = MediaIoBaseDownload(fd, request)
+    done, retries = False, 0
+    while not done and retries < 20:
+        DRIVE_CALLS.inc(op="files.get_media")
+        _, done = downloader.next_chunk()
+        retries += 1
+
+def download_file(service, file, ext):
+    """Small files come back as bytes; large ones spill to a unique temp path."""
+    request = service.files().get_media(fileId=file["id"])
+    if int(file.get("size", 0)) <= INMEMORY_DOWNLOAD_LIMIT:
+        buffer = _thread_buffer()
+        _fetch(request, buffer)
+        return buffer.getvalue()
+    fd, path = tempfile.mkstemp(suffix=ext)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            _fetch(request, f)
+        return path
+    except Exception:
+        os.remove(path)
+        raise
+
+# 🏭 Download threads → bounded hand-off → sandboxed extraction processes → single writer
+def run_pipeline(creds, candidates, handle_result):
+    results = queue.Queue()
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads, ExtractionService() as extracts:
+
+        def stage(file, ext):
+            try:
+                with FILE_DOWNLOAD.time(ext=ext):
+                    source = download_file(_thread_service(creds), file, ext)
+            except Exception as e:
+                results.put((file, ext, None, e))
+                return
+            path = source if isinstance(source, str) else None
+            started = time.perf_counter()
+            try:
+                future = extracts.submit(source, ext)
+            except Exception as e:
+                results.put((file, ext, path, e))
+                return
+
+            def extracted(f):
+                FILE_EXTRACT.observe(time.perf_counter() - started, ext=ext)
+                results.put((file, ext, path, f))
+            future.add_done_callback(extracted)
+
+        pending, in_flight = deque(candidates), 0
+        while pending or in_flight:
+            while pending and in_flight < PIPELINE_QUEUE_SIZE:
+                downloads.submit(stage, *pending.popleft())
+                in_flight += 1
+            file, ext, path, outcome = results.get()
+            in_flight -= 1
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                text = outcome.result()
+            except Exception as e:
+                handle_result(file, ext, None, error=e)
+            else:
+                handle_result(file, ext, text)
+            finally:
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+def run_drive_processing(full=False):
+    processing_status.update({"running": True, "stage": "Starting cleanup", "log": {}, "progress": {}})
     move_log, error_log = {}, []
+    files, local_duplicate_count, unchanged_count = [], 0, 0
+    drive_ops = None
+    staged_hashes, staged_names = set(), set()  # dedup state added since the last checkpoint
+
+    # 🔁 A run that died mid-way is picked up again with its original scope; the manifest skips finished files
+    job = IngestJob()
+    resumed = job.begin(full)
+    full = job.state["full"]
+    if resumed:
+        print(f"🔁 Resuming ingestion job {job.state['id']} after {job.state['checkpoints']} checkpoints")
 
     try:
         creds = authenticate_drive()
         if not creds:
             processing_status.update({"running": False, "stage": "Drive authentication failed"})
+            job.finish("Drive authentication failed", resumable=resumed)  # nothing new to resume
             return
 
         service = build("drive", "v3", credentials=creds)
-        processing_status["stage"] = "Scanning Drive"
+        tree = FolderTree()
+        drive_ops = DriveBatcher(service, processing_status["log"], tree=tree)
+        manifest = SyncManifest()
+        file_hashes.update(manifest.content_hashes())
+
+        # 🔁 Change feed when we have a cursor, full listing otherwise
+        removed = set()
+        if full or DRIVE_SYNC_MODE == "full" or not manifest.page_token:
+            processing_status["stage"] = "Scanning Drive"
+            next_token = get_start_page_token(service)
+            files, folders = get_all_files_iteratively(service, tree)
+            # The listing saw every live item: known ids it missed are gone, and sorted files that were
+            # renamed sit outside root, so fetch them for re-ingestion under the new name
+            removed = {fid for fid in manifest.files if fid not in tree.items}
+            listed = {f["id"] for f in files}
+            for fid, entry in manifest.files.items():
+                if fid in tree.items and fid not in listed and tree.items[fid][0] != entry["name"]:
+                    files.append(execute(service.files().get(fileId=fid, fields=FILE_FIELDS), "files.get"))
+        else:
+            processing_status["stage"] = "Reading Drive changes"
+            changed, removed, next_token = list_changes(service, manifest.page_token)
+            for item in changed:
+                tree.add(item)
+            for fid in removed:
+                tree.remove(fid)
+            # Same scope as a full scan (root, shared-with-me, orphans), plus files we already sorted or indexed
+            files = [
+                f for f in changed
+                if f["mimeType"] != FOLDER_MIME and (_needs_sorting(f, tree.root_id) or f["id"] in manifest.files)
+            ]
+            folders = []
 
-        files, folders = get_all_files_iteratively(service)
         ext_counter = {}
-        for f in files:
-            ext = os.path.splitext(f['name'])[-1].lower()
+        known = {fid: e["name"] for fid, e in manifest.files.items()}
+        known.update({f["id"]: f["name"] for f in files})
+        for name in known.values():
+            ext = os.path.splitext(name)[-1].lower()
             ext_counter[ext] = ext_counter.get(ext, 0) + 1
 
-        folder_ids = {name: ensure_folder(service, name) for name in BASE_FOLDERS}
-        quarantine_id = ensure_folder(service, "Quarantine")
-        new_knowledge = {}
-        local_duplicate_count = 0
+        folder_ids = {name: ensure_folder(service, name, tree) for name in BASE_FOLDERS}
+        quarantine_id = folder_ids["Quarantine"]
+        new_knowledge, new_meta, evicted = {}, {}, []
+
+        # 🪦 A file id that went away or changed name: its old name (and hash) no longer stand for anything in Drive
+        def retire(file_id):
+            entry = manifest.forget(file_id)
+            if entry is None:
+                return
+            if entry["name"] not in manifest.names():
+                if entry["name"] in knowledge_base:
+                    evicted.append(entry["name"])
+                processed_files.discard(entry["name"])
+            release_hash(entry)
+
+        # ♻️ An old content hash only blocks re-adds while some manifest entry still holds it
+        def release_hash(entry):
+            if entry and entry.get("content_hash") and not manifest.uses_hash(entry["content_hash"]):
+                file_hashes.discard(entry["content_hash"])
+
+        def record(file, status, h=None):
+            release_hash(manifest.record(file, status, h))  # an edited file gives up its previous content
+
+        for fid in removed:
+            retire(fid)
 
+        candidates = []
         for file in files:
+            entry = manifest.files.get(file["id"])
+            if entry is not None and entry["name"] != file["name"]:
+                retire(file["id"])
+            ext = os.path.splitext(file['name'])[-1].lower() or ".unknown"
+            if ext not in EXTENSION_MAP:
+                continue
+            if manifest.is_unchanged(file):
+                unchanged_count += 1
+                continue
+            if int(file.get("size", 0)) > MAX_FILE_SIZE:
+                drive_ops.move(file, quarantine_id, move_log.setdefault("Quarantine", []))
+                error_log.append({"file": file['name'], "reason": "File too large"})
+                record(file, "quarantined")
+                QUARANTINES.inc(reason="too_large")
+                continue
+            candidates.append((file, ext))
+        job.plan(len(candidates), sum(int(f.get("size", 0)) for f, _ in candidates))
+
+        # ✍️ Writer stage: the only place that touches the knowledge base, dedup state and moves
+        def handle_result(file, ext, text, error=None):
+            nonlocal local_duplicate_count
+            name, file_id = file['name'], file['id']
+            print(f"📂 Processing: {name}")
             try:
-                print(f"📂 Processing: {file['name']}")
-                name, file_id = file['name'], file['id']
-                ext = os.path.splitext(name)[-1].lower() or ".unknown"
-                size = int(file.get("size", 0))
-
-                if ext not in EXTENSION_MAP:
-                    continue
-
-                if size > 50 * 1024 * 1024:
-                    move_file(service, file_id, quarantine_id, move_log.setdefault("Quarantine", []))
-                    error_log.append({"file": name, "reason": "File too large"})
-                    continue
-
-                request = service.files().get_media(fileId=file_id)
-                path = os.path.join(tempfile.gettempdir(), name)
-                with open(path, "wb") as f:
-                    downloader = MediaIoBaseDownload(f, request)
-                    done, retries = False, 0
-                    while not done and retries < 20:
-                        _, done = downloader.next_chunk()
-                        retries += 1
-
-                text = extract_text(path, ext)
-                os.remove(path)
+                if error is not None:
+                    raise error
 
                 if not text or len(text.strip()) < 10:
-                    move_file(service, file_id, quarantine_id, move_log.setdefault("Quarantine", []))
+                    drive_ops.move(file, quarantine_id, move_log.setdefault("Quarantine", []))
                     error_log.append({"file": name, "reason": "Empty or unreadable content"})
-                    continue
+                    record(file, "quarantined")
+                    QUARANTINES.inc(reason="empty")
+                    if name in knowledge_base:
+                        evicted.append(name)
+                    return
 
                 category = EXTENSION_MAP.get(ext, "Miscellaneous") if ext_counter.get(ext, 0) >= 10 else "Miscellaneous"
+                h = content_hash(text)
 
                 if not is_duplicate(text, name):
                     if category in ["Word_Documents", "PDFs", "Excel_Files", "Miscellaneous"]:
                         new_knowledge[name] = text
-                        file_hashes.add(hashlib.md5(text.encode("utf-8")).hexdigest())
-                        processed_files.add(name)
+                        new_meta[name] = {"folder": source_folder(file, tree), "modified": file.get("modifiedTime")}
+                        if h not in file_hashes:
+                            file_hashes.add(h)
+                            staged_hashes.add(h)
+                        if name not in processed_files:
+                            processed_files.add(name)
+                            staged_names.add(name)
+                    record(file, "sorted", h)
                 else:
                     local_duplicate_count += 1
+                    record(file, "duplicate", h)
+                    if name in knowledge_base and doc_table.get_hash(name) != h:
+                        evicted.append(name)  # edited into a copy of another file: its old text must go
 
-                move_file(service, file_id, folder_ids[category], move_log.setdefault(category, []))
+                drive_ops.move(file, folder_ids[category], move_log.setdefault(category, []))
                 log_memory()
 
             except Exception as e:
-                move_file(service, file['id'], quarantine_id, move_log.setdefault("Quarantine", []))
-                error_log.append({"file": file.get('name'), "reason": str(e)})
+                drive_ops.move(file, quarantine_id, move_log.setdefault("Quarantine", []))
+                error_log.append({"file": name, "reason": str(e)})
+                record(file, "quarantined")
+                QUARANTINES.inc(reason="error")
+
+        # 💾 Index what's pending, persist the cursor, and only then move the files (knowledge/index → manifest →
+        # moves): a crash after a checkpoint loses nothing before it, and files after it are still in place to redo
+        def checkpoint():
+            if evicted:
+                remove_documents(evicted)
+            if new_knowledge:
+                upsert_documents(new_knowledge, new_meta)
+            for entry in manifest.files.values():
+                if entry["name"] in new_knowledge:
+                    entry["doc_id"] = doc_table.get_id(entry["name"])
+            manifest.save()
+            with open(processed_files_path, "w") as f:
+                json.dump(list(processed_files), f)
+            drive_ops.flush()
+            staged_hashes.clear()
+            staged_names.clear()
+            evicted.clear()
+            new_knowledge.clear()
+            new_meta.clear()
+            job.checkpointed()
 
+        def handle_and_checkpoint(file, ext, text, error=None):
+            handle_result(file, ext, text, error)
+            job.advance(file.get("size"))
+            processing_status["progress"] = job.progress()
+            if job.due():
+                processing_status["stage"] = f"Checkpoint {job.state['checkpoints'] + 1}"
+                checkpoint()
+                processing_status["stage"] = f"Processing {len(candidates)} files"
+
+        processing_status["stage"] = f"Processing {len(candidates)} files"
+        run_pipeline(creds, candidates, handle_and_checkpoint)
+        checkpoint()
+
+        # 🧹 Emptiness from the tree (probe only unknown folders), then batched deletes
         processing_status["stage"] = "Cleaning empty folders"
+        empty_folders = []
         for fid, name in folders:
             if name in BASE_FOLDERS:
                 continue
-            contents = service.files().list(q=f"'{fid}' in parents", fields="files(id)").execute().get("files", [])
-            if not contents:
-                try:
-                    service.files().delete(fileId=fid).execute()
-                except Exception as e:
-                    error_log.append({"folder": name, "reason": str(e)})
-
-        knowledge_base.update(new_knowledge)
-        np.save("ai_metadata.npy", knowledge_base)
-        with open(processed_files_path, "w") as f:
-            json.dump(list(processed_files), f)
+            if tree.root_id and fid in tree.items:
+                if tree.is_empty(fid):
+                    empty_folders.append((fid, name))
+            else:
+                drive_ops.probe_empty(fid, lambda fid=fid, name=name: empty_folders.append((fid, name)), name)
+        drive_ops.flush()
+        for fid, name in empty_folders:
+            drive_ops.delete(fid, name)
+        drive_ops.flush()
 
-        if new_knowledge:
-            rebuild_faiss()
+        # ✅ Only a completed run advances the change-feed cursor
+        manifest.page_token = next_token
+        manifest.save()
+        tree.save()
+        job.finish()
 
     except Exception as e:
         error_log.append({"fatal": str(e)})
         processing_status["stage"] = f"Fatal error: {e}"
+        job.finish(e)
 
     finally:
+        # Moves and dedup entries since the last checkpoint belong to uncommitted files (no-op after a clean run):
+        # the resumed run must find those files in root and must not take them for duplicates
+        if drive_ops is not None and drive_ops.discard():
+            error_log.append({"moves_discarded": "run ended before its last checkpoint"})
+        file_hashes.difference_update(staged_hashes)
+        processed_files.difference_update(staged_names)
+        batch_errors = {k: v for k, v in processing_status["log"].items() if k.endswith("_errors")}
         processing_status.update({
             "running": False,
             "last_run": datetime.utcnow().isoformat(),
             "stage": "idle",
+            "progress": job.progress(),
             "log": {
                 "moved": move_log,
                 "errors": error_log,
                 "count": len(files),
                 "processed": sum(len(v) for v in move_log.values()),
-                "duplicates_skipped": local_duplicate_count
+                "duplicates_skipped": local_duplicate_count,
+                "unchanged_skipped": unchanged_count,
+                "drive_batches": drive_ops.requests_sent if drive_ops else 0,
+                "job": job.state.get("id"),
+                "resumed": resumed,
+                "checkpoints": job.state.get("checkpoints", 0),
+                **batch_errors
             }
         })
+
+# 🚦 Every Drive run goes through here: one at a time across threads and workers
+drive_jobs = JobScheduler(run_drive_processing)
@@ -3,6 +3,14 @@
 # 👇 Update this to your actual host/port if not localhost
 BASE_URL="http://localhost:10000"
 
+echo "🚦 GET /ready"
+curl -s "$BASE_URL/ready" | jq
+echo -e "\n-----------------------------\n"
+
+echo "📊 GET /metrics"
+curl -s "$BASE_URL/metrics" | grep -v "^#" | head -20
+echo -e "\n-----------------------------\n"
+
 echo "🔍 GET /status"
 curl -s "$BASE_URL/status" | jq
 echo -e "\n-----------------------------\n"
@@ -26,3 +34,16 @@ echo -e "\n-----------------------------\n"
 echo "💬 GET /query?question=How do we position TGI?"
 curl -s "$BASE_URL/query?question=How%20do%20we%20position%20TGI?" | jq
 echo -e "\n-----------------------------\n"
+
+echo "📦 POST /query/batch"
+curl -s -X POST "$BASE_URL/query/batch" -H "Content-Type: application/json" \
+  -d '[{"question": "How do we position TGI?", "top_k": 3}, {"question": "Social DNA segmentation", "file_type": "pdf"}]' | jq
+echo -e "\n-----------------------------\n"
+
+echo "🔤 GET /query?question=Quintiles&mode=lexical"
+curl -s "$BASE_URL/query?question=Quintiles&mode=lexical" | jq
+echo -e "\n-----------------------------\n"
+
+echo "🗂️ GET /query?question=Social DNA&file_type=pdf&modified_after=2024-01-01"
+curl -s "$BASE_URL/query?question=Social%20DNA&file_type=pdf&modified_after=2024-01-01" | jq
+echo -e "\n-----------------------------\n"
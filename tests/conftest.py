@@ -0,0 +1,64 @@
+# ✅ conftest.py – Isolated Working Directory, Fake Encoder and Fake Drive Wiring
+import hashlib
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACT_WORKERS", "2")
+
+from fake_drive import FakeDrive
+
+# Modules that load state from the working directory at import time
+STATEFUL_MODULES = ("shared", "sort_drive", "search_faiss", "app")
+
+# 🧠 Deterministic bag-of-words vectors: shared words land close together, no model download
+class FakeEncoder:
+    backend = "fake"
+    model_name = "fake-encoder"
+    loaded = True
+    dim = 32
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def warm_up(self):
+        pass
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in zip(vectors, texts):
+            for word in text.lower().split():
+                row[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+            norm = np.linalg.norm(row)
+            if norm:
+                row /= norm
+        return vectors
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in STATEFUL_MODULES:
+        sys.modules.pop(name, None)
+    yield tmp_path
+    for name in STATEFUL_MODULES:
+        sys.modules.pop(name, None)
+
+@pytest.fixture
+def shared(workdir, monkeypatch):
+    import shared
+    monkeypatch.setattr(shared, "model", FakeEncoder())
+    return shared
+
+# 📁 sort_drive against an in-memory Drive; downloads go through the fake's get_media
+@pytest.fixture
+def drive(shared, monkeypatch):
+    import sort_drive
+    fake = FakeDrive()
+    monkeypatch.setattr(sort_drive, "authenticate_drive", lambda: object())
+    monkeypatch.setattr(sort_drive, "build", lambda *args, **kwargs: fake)
+    monkeypatch.setattr(sort_drive, "_thread_service", lambda creds: fake)
+    monkeypatch.setattr(sort_drive, "download_file",
+                        lambda service, file, ext: service.files().get_media(fileId=file["id"]).execute())
+    return fake
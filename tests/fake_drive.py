@@ -0,0 +1,179 @@
+# ✅ fake_drive.py – In-Memory Drive v3 Service (files, changes, batch) for sync tests
+import hashlib
+import itertools
+import re
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+class FakeRequest:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+# 📁 Items live in one dict; every mutation is appended to the change log the changes() feed pages through
+class FakeDrive:
+    def __init__(self, page_size=2):
+        self.items = {}
+        self.content = {}
+        self.log = []
+        self.calls = []
+        self.page_size = page_size  # small pages so pagination is exercised
+        self._ids = itertools.count(1)
+        self._clock = itertools.count(1)
+
+    # ✏️ Test-side edits (what a user does in Drive)
+    def add_file(self, name, data, parents=("root",), mime="text/plain"):
+        file_id = f"file{next(self._ids)}"
+        self.items[file_id] = {"id": file_id, "name": name, "mimeType": mime, "parents": list(parents), "ownedByMe": True}
+        self._write(file_id, data)
+        return file_id
+
+    def add_folder(self, name, parents=("root",)):
+        folder_id = f"folder{next(self._ids)}"
+        self.items[folder_id] = {"id": folder_id, "name": name, "mimeType": FOLDER_MIME, "parents": list(parents), "ownedByMe": True}
+        self._changed(folder_id)
+        return folder_id
+
+    def edit(self, file_id, data):
+        self._write(file_id, data)
+
+    def rename(self, file_id, name):
+        self.items[file_id]["name"] = name
+        self._touch(file_id)
+
+    def trash(self, file_id):
+        self.items.pop(file_id)
+        self.content.pop(file_id, None)
+        self.log.append({"fileId": file_id, "removed": True})
+
+    def in_folder(self, folder_id):
+        return sorted(i["name"] for i in self.items.values() if folder_id in i["parents"])
+
+    def folder_id(self, name):
+        return next(i["id"] for i in self.items.values() if i["name"] == name and i["mimeType"] == FOLDER_MIME)
+
+    def _write(self, file_id, data):
+        self.content[file_id] = data
+        self.items[file_id].update(size=str(len(data)), md5Checksum=hashlib.md5(data).hexdigest())
+        self._touch(file_id)
+
+    def _touch(self, file_id):
+        self.items[file_id]["modifiedTime"] = f"2024-01-01T00:00:{next(self._clock):02d}Z"
+        self._changed(file_id)
+
+    def _changed(self, file_id):
+        self.log.append({"fileId": file_id, "removed": False, "file": dict(self.items[file_id])})
+
+    # 🔌 Service surface used by sort_drive / drive_sync / drive_batch
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def _page(self, items, page_token):
+        start = int(page_token or 0)
+        response = {"files": [dict(i) for i in items[start:start + self.page_size]]}
+        if start + self.page_size < len(items):
+            response["nextPageToken"] = str(start + self.page_size)
+        return response
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q=None, pageToken=None, **kwargs):
+        drive = self.drive
+        drive.calls.append(("files.list", q))
+        folders_only = "mimeType='application/vnd.google-apps.folder'" in (q or "")
+        name = re.search(r"name='([^']*)'", q or "")
+        parent = re.search(r"'([^']*)' in parents", q or "")
+
+        def run():
+            matches = [
+                i for i in drive.items.values()
+                if (not folders_only or i["mimeType"] == FOLDER_MIME)
+                and (name is None or i["name"] == name.group(1))
+                and (parent is None or parent.group(1) in i["parents"])
+            ]
+            return drive._page(matches, pageToken)
+        return FakeRequest(run)
+
+    def get(self, fileId=None, fields=None, **kwargs):
+        self.drive.calls.append(("files.get", fileId))
+        if fileId == "root":
+            return FakeRequest(lambda: {"id": "root"})
+        return FakeRequest(lambda: dict(self.drive.items[fileId]))
+
+    def create(self, body=None, fields=None, **kwargs):
+        self.drive.calls.append(("files.create", body["name"]))
+        return FakeRequest(lambda: {"id": self.drive.add_folder(body["name"], body.get("parents", ["root"]))})
+
+    def update(self, fileId=None, addParents=None, removeParents=None, fields=None, **kwargs):
+        self.drive.calls.append(("files.update", fileId))
+
+        def run():
+            item = self.drive.items[fileId]
+            dropped = set(filter(None, (removeParents or "").split(",")))
+            item["parents"] = [p for p in item["parents"] if p not in dropped] + ([addParents] if addParents else [])
+            self.drive._changed(fileId)
+            return {"id": fileId, "parents": item["parents"]}
+        return FakeRequest(run)
+
+    def delete(self, fileId=None, **kwargs):
+        self.drive.calls.append(("files.delete", fileId))
+
+        def run():
+            self.drive.trash(fileId)
+            return {}
+        return FakeRequest(run)
+
+    def get_media(self, fileId=None, **kwargs):
+        self.drive.calls.append(("files.get_media", fileId))
+        return FakeRequest(lambda: self.drive.content[fileId])
+
+class _Changes:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(lambda: {"startPageToken": str(len(self.drive.log))})
+
+    def list(self, pageToken=None, **kwargs):
+        drive = self.drive
+        drive.calls.append(("changes.list", pageToken))
+
+        def run():
+            start = int(pageToken)
+            end = start + drive.page_size
+            response = {"changes": [dict(c) for c in drive.log[start:end]]}
+            if end >= len(drive.log):
+                response["newStartPageToken"] = str(len(drive.log))
+            else:
+                response["nextPageToken"] = str(end)
+            return response
+        return FakeRequest(run)
+
+class _Batch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.drive.calls.append(("batch", len(self.requests)))
+        for request_id, request in self.requests:
+            try:
+                response = request.execute()
+            except Exception as e:
+                self.callback(request_id, None, e)
+            else:
+                self.callback(request_id, response, None)
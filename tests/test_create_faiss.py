@@ -0,0 +1,25 @@
+# ✅ test_create_faiss.py – The Standalone Indexer Publishes a Generation the Servers Load
+import os
+import runpy
+import fitz
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "create_faiss.py")
+
+def pdf(text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    return doc.tobytes()
+
+def test_create_faiss_writes_through_the_shared_store(shared, drive, monkeypatch):
+    import googleapiclient.discovery
+    from google.oauth2 import service_account
+    monkeypatch.setattr(googleapiclient.discovery, "build", lambda *args, **kwargs: drive)
+    monkeypatch.setattr(service_account.Credentials, "from_service_account_file", lambda *args, **kwargs: object())
+    drive.add_file("pricing.pdf", pdf("pricing tiers and volume discounts"), mime="application/pdf")
+    drive.add_file("empty.pdf", pdf(""), mime="application/pdf")
+
+    runpy.run_path(SCRIPT)
+
+    assert sorted(shared.knowledge_base) == ["pricing.pdf"]
+    shared.refresh_snapshot(force=True)
+    assert sorted(shared.snapshots.current.docs.ids) == ["pricing.pdf"]
@@ -0,0 +1,72 @@
+# ✅ test_drive_batch.py – Batched Moves/Deletes/Probes and Per-Request Error Reporting
+from drive_batch import DriveBatcher
+from drive_tree import FolderTree
+from fake_drive import FakeDrive
+
+def test_moves_are_sent_in_chunks_and_update_the_tree(tmp_path):
+    drive = FakeDrive()
+    target = drive.add_folder("Pricing")
+    files = [drive.items[drive.add_file(f"p{i}.txt", b"pricing")] for i in range(5)]
+    tree = FolderTree(str(tmp_path / "folder_tree.json"))
+    for item in files:
+        tree.add(item)
+    log, moved = {}, []
+    batcher = DriveBatcher(drive, log, tree, batch_limit=2)
+
+    for item in files:
+        batcher.move(dict(item), target, moved)
+    assert moved == [] and drive.in_folder(target) == []  # nothing is sent before flush()
+    batcher.flush()
+
+    assert [c for c in drive.calls if c[0] == "batch"] == [("batch", 2), ("batch", 2), ("batch", 1)]
+    assert drive.in_folder(target) == [f"p{i}.txt" for i in range(5)]
+    assert sorted(moved) == sorted(i["id"] for i in files) and log == {}
+    assert tree.children[target] == {i["id"] for i in files}
+
+def test_failed_requests_are_logged_per_item(tmp_path):
+    drive = FakeDrive()
+    folder = drive.add_folder("Old")
+    kept = drive.add_file("a.txt", b"alpha")
+    log, moved = {}, []
+    batcher = DriveBatcher(drive, log)
+
+    batcher.delete(folder, name="Old")
+    batcher.delete("missing", name="Gone")
+    batcher.move({"id": "ghost", "parents": ["root"]}, folder, moved)
+    batcher.move(dict(drive.items[kept]), folder, moved)
+    batcher.flush()
+
+    assert folder not in drive.items and moved == [kept]
+    assert [(e["folder"], e["file_id"]) for e in log["delete_errors"]] == [("Gone", "missing")]
+    assert [e["file_id"] for e in log["move_errors"]] == ["ghost"]
+    assert all(e["error"] for errors in log.values() for e in errors)
+
+def test_a_rejected_batch_logs_every_request_in_it():
+    class Broken(FakeDrive):
+        def new_batch_http_request(self, callback=None):
+            batch = super().new_batch_http_request(callback)
+            batch.execute = lambda: (_ for _ in ()).throw(OSError("connection reset"))
+            return batch
+
+    drive = Broken()
+    folders = [drive.add_folder(f"f{i}") for i in range(3)]
+    log = {}
+    batcher = DriveBatcher(drive, log)
+    for folder in folders:
+        batcher.probe_empty(folder, lambda: None, name=folder)
+    batcher.flush()
+
+    assert [e["file_id"] for e in log["probe_errors"]] == folders
+    assert {e["error"] for e in log["probe_errors"]} == {"connection reset"}
+    assert batcher.pending == []
+
+def test_probe_only_reports_empty_folders():
+    drive = FakeDrive()
+    empty, full = drive.add_folder("Empty"), drive.add_folder("Full")
+    drive.add_file("x.txt", b"x", parents=(full,))
+    found = []
+    batcher = DriveBatcher(drive, {})
+    batcher.probe_empty(empty, lambda: found.append("Empty"))
+    batcher.probe_empty(full, lambda: found.append("Full"))
+    batcher.flush()
+    assert found == ["Empty"]
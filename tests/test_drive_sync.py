@@ -0,0 +1,168 @@
+# ✅ test_drive_sync.py – Full Sync, Change Feed, Removal and Rename Against the Fake Drive
+from drive_sync import SyncManifest
+from fake_drive import FOLDER_MIME
+
+def text(*words):
+    return (" ".join(words) + " ") * 20
+
+def run(shared, full=False):
+    import sort_drive
+    sort_drive.run_drive_processing(full=full)
+    fatal = [e for e in shared.processing_status["log"]["errors"] if "fatal" in e]
+    assert not fatal, fatal
+
+def indexed(shared):
+    return sorted(shared.knowledge_base)
+
+def served(shared):
+    shared.refresh_snapshot(force=True)
+    return sorted(shared.snapshots.current.docs.ids)
+
+def test_full_sync_indexes_sorts_and_quarantines(shared, drive):
+    drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    drive.add_file("onboarding.txt", text("onboarding", "checklist").encode())
+    drive.add_file("blank.txt", b"   ")
+
+    run(shared, full=True)
+
+    assert indexed(shared) == ["onboarding.txt", "pricing.txt"]
+    assert served(shared) == ["onboarding.txt", "pricing.txt"]
+    assert all(i["mimeType"] == FOLDER_MIME for i in drive.items.values() if "root" in i["parents"])
+    assert drive.in_folder(drive.folder_id("Miscellaneous")) == ["onboarding.txt", "pricing.txt"]
+    assert drive.in_folder(drive.folder_id("Quarantine")) == ["blank.txt"]
+    manifest = SyncManifest()
+    assert manifest.page_token is not None
+    assert {e["status"] for e in manifest.files.values()} == {"sorted", "quarantined"}
+
+def test_change_feed_only_reads_changes(shared, drive):
+    pricing = drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    drive.add_file("onboarding.txt", text("onboarding", "checklist").encode())
+    run(shared, full=True)
+
+    drive.add_file("roadmap.txt", text("roadmap", "quarter").encode())
+    drive.edit(pricing, text("pricing", "discounts").encode())
+    drive.calls.clear()
+    run(shared)
+
+    assert ("files.list", "trashed = false") not in drive.calls
+    assert any(call[0] == "changes.list" for call in drive.calls)
+    assert indexed(shared) == ["onboarding.txt", "pricing.txt", "roadmap.txt"]
+    assert "discounts" in shared.knowledge_base["pricing.txt"]
+    assert shared.processing_status["log"]["unchanged_skipped"] >= 1
+
+def test_removed_file_is_evicted(shared, drive):
+    pricing = drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    drive.add_file("onboarding.txt", text("onboarding", "checklist").encode())
+    run(shared, full=True)
+
+    drive.trash(pricing)
+    run(shared)
+
+    assert indexed(shared) == ["onboarding.txt"]
+    assert served(shared) == ["onboarding.txt"]
+    assert pricing not in SyncManifest().files
+
+def test_readding_removed_content_is_not_a_duplicate(shared, drive):
+    pricing = drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    run(shared, full=True)
+    drive.trash(pricing)
+    run(shared)
+
+    drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    run(shared)
+
+    assert indexed(shared) == ["pricing.txt"]
+
+def test_rename_reindexes_under_new_name(shared, drive):
+    note = drive.add_file("note1.txt", text("warranty", "terms").encode())
+    drive.add_file("note2.txt", text("shipping", "times").encode())
+    run(shared, full=True)
+
+    drive.rename(note, "renamed_note1.txt")
+    run(shared)
+
+    assert indexed(shared) == ["note2.txt", "renamed_note1.txt"]
+    assert served(shared) == ["note2.txt", "renamed_note1.txt"]
+    assert SyncManifest().files[note]["name"] == "renamed_note1.txt"
+
+def test_rename_is_caught_by_a_full_scan(shared, drive):
+    note = drive.add_file("note1.txt", text("warranty", "terms").encode())
+    run(shared, full=True)
+
+    drive.rename(note, "renamed_note1.txt")
+    run(shared, full=True)
+
+    assert indexed(shared) == ["renamed_note1.txt"]
+
+def test_folder_filter_uses_the_original_drive_folder(shared, drive):
+    drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    contracts = drive.add_folder("Contracts")
+    shared_file = drive.add_file("msa.txt", text("master", "agreement").encode(), parents=(contracts,))
+    drive.items[shared_file]["sharedWithMeTime"] = "2024-01-01T00:00:00Z"
+    run(shared, full=True)
+
+    folder = lambda name: shared.doc_meta.row(shared.doc_table.get_id(name))["folder"]
+    assert folder("pricing.txt") == "My Drive"
+    assert folder("msa.txt") == "Contracts"
+
+def test_change_feed_keeps_to_the_full_scan_scope(shared, drive):
+    drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    projects = drive.add_folder("Projects")
+    plan = drive.add_file("plan.txt", text("project", "plan").encode(), parents=(projects,))
+    run(shared, full=True)
+    assert drive.in_folder(projects) == ["plan.txt"]
+
+    drive.edit(plan, text("project", "plan", "revised").encode())
+    drive.add_file("roadmap.txt", text("roadmap", "quarter").encode())
+    drive.calls.clear()
+    run(shared)
+
+    assert indexed(shared) == ["pricing.txt", "roadmap.txt"]
+    assert drive.in_folder(projects) == ["plan.txt"]
+    assert ("files.get_media", plan) not in drive.calls
+
+def test_change_feed_picks_up_files_shared_with_me(shared, drive):
+    drive.add_file("pricing.txt", text("pricing", "tiers").encode())
+    run(shared, full=True)
+
+    theirs = drive.add_folder("Partner", parents=("someone-else",))
+    msa = drive.add_file("msa.txt", text("master", "agreement").encode(), parents=(theirs,))
+    drive.items[msa].update(ownedByMe=False, sharedWithMeTime="2024-02-01T00:00:00Z")
+    drive.edit(msa, text("master", "agreement", "signed").encode())
+    run(shared)
+
+    assert indexed(shared) == ["msa.txt", "pricing.txt"]
+
+def test_edited_file_releases_its_old_content(shared, drive):
+    x = drive.add_file("x.txt", text("alpha", "one").encode())
+    run(shared, full=True)
+
+    drive.edit(x, text("beta", "two").encode())
+    run(shared)
+    drive.add_file("z.txt", text("alpha", "one").encode())
+    run(shared)
+
+    assert indexed(shared) == ["x.txt", "z.txt"]
+    assert "alpha" in shared.knowledge_base["z.txt"]
+
+def test_file_edited_into_a_duplicate_is_evicted(shared, drive):
+    x = drive.add_file("x.txt", text("alpha", "one").encode())
+    drive.add_file("y.txt", text("gamma", "three").encode())
+    run(shared, full=True)
+
+    drive.edit(x, text("gamma", "three").encode())
+    run(shared)
+
+    assert indexed(shared) == ["y.txt"]
+    shared.refresh_snapshot(force=True)
+    assert shared.snapshots.current.lexical.search("alpha one", 5) == []
+
+def test_touched_file_with_same_content_stays_indexed(shared, drive):
+    x = drive.add_file("x.txt", text("alpha", "one").encode())
+    run(shared, full=True)
+
+    drive.edit(x, text("alpha", "one").encode())
+    drive.items[x]["md5Checksum"] = "changed-by-drive"
+    run(shared)
+
+    assert indexed(shared) == ["x.txt"]
@@ -0,0 +1,48 @@
+# ✅ test_drive_tree.py – Cached Folder Tree (Add, Reparent, Remove, Lookup, Persistence)
+from drive_tree import FOLDER_MIME, FolderTree
+
+def item(item_id, name, parents=("root",), folder=False):
+    return {"id": item_id, "name": name, "parents": list(parents), "mimeType": FOLDER_MIME if folder else "text/plain"}
+
+def tree_with_folders(tmp_path):
+    tree = FolderTree(str(tmp_path / "folder_tree.json"))
+    tree.root_id = "root"
+    tree.add(item("f1", "Pricing", folder=True))
+    tree.add(item("f2", "Archive", folder=True))
+    tree.add(item("a", "pricing.txt", parents=("f1",)))
+    return tree
+
+def test_find_folder_only_matches_folders_under_the_parent(tmp_path):
+    tree = tree_with_folders(tmp_path)
+    tree.add(item("n", "Notes", parents=("f2",), folder=True))
+    tree.add(item("x", "Notes"))  # a file, not a folder
+
+    assert tree.find_folder("Pricing") == "f1"
+    assert tree.find_folder("Notes") is None
+    assert tree.find_folder("Notes", parent="f2") == "n"
+
+def test_reparent_and_remove_keep_child_sets_in_step(tmp_path):
+    tree = tree_with_folders(tmp_path)
+    assert not tree.is_empty("f1") and tree.is_empty("f2")
+
+    tree.reparent("a", ["f2"])
+    assert tree.is_empty("f1") and tree.children["f2"] == {"a"}
+
+    tree.remove("a")
+    assert tree.is_empty("f2") and "a" not in tree.items
+    tree.reparent("a", ["f1"])  # unknown items stay unknown
+    assert tree.is_empty("f1")
+
+def test_save_and_load_round_trip(tmp_path):
+    tree = tree_with_folders(tmp_path)
+    tree.save()
+
+    reloaded = FolderTree(tree.path)
+    assert reloaded.root_id == "root"
+    assert reloaded.items == tree.items and reloaded.children == tree.children
+
+def test_corrupt_file_loads_empty(tmp_path):
+    path = tmp_path / "folder_tree.json"
+    path.write_text("{not json")
+    tree = FolderTree(str(path))
+    assert tree.items == {} and tree.find_folder("Pricing") is None
@@ -0,0 +1,81 @@
+# ✅ test_embeddings.py – Embedding Cache Reuse and Encoder Tagging
+import numpy as np
+from conftest import FakeEncoder
+from embeddings import EmbeddingCache, content_hash, embed_texts
+
+class CountingEncoder(FakeEncoder):
+    def __init__(self, model_name="fake-encoder", backend="fake"):
+        self.model_name, self.backend, self.encoded = model_name, backend, 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return super().encode(texts, **kwargs)
+
+TEXTS = ["pricing tiers", "onboarding checklist", "pricing tiers"]
+
+def fill(path, model):
+    cache = EmbeddingCache(path)
+    vectors = embed_texts(model, TEXTS, cache)
+    cache.save()
+    return vectors
+
+def test_cache_is_reused_by_the_same_encoder(tmp_path):
+    path = str(tmp_path / "cache.json")
+    first = fill(path, CountingEncoder())
+    model = CountingEncoder()
+    again = embed_texts(model, TEXTS, EmbeddingCache(path))
+    assert model.encoded == 0
+    assert np.array_equal(first, again)
+
+def test_cache_from_another_model_or_backend_is_discarded(tmp_path):
+    path = str(tmp_path / "cache.json")
+    fill(path, CountingEncoder())
+    for model in (CountingEncoder(model_name="other-model"), CountingEncoder(backend="onnx")):
+        cache = EmbeddingCache(path)
+        embed_texts(model, TEXTS, cache)
+        assert model.encoded == 2
+        assert cache.encoder == f"{model.backend}:{model.model_name}"
+
+def test_legacy_single_file_cache_is_ignored_and_removed(tmp_path):
+    legacy = tmp_path / "embedding_cache.npz"
+    np.savez(legacy, hashes=np.array(["x"]), vectors=np.zeros((1, 32), dtype="float32"))
+    model = CountingEncoder()
+    fill(str(tmp_path / "embedding_cache.json"), model)
+    assert model.encoded == 2
+    assert not legacy.exists()
+
+def test_save_appends_only_new_vectors(tmp_path):
+    path = str(tmp_path / "cache.json")
+    model = CountingEncoder()
+    cache = EmbeddingCache(path)
+    embed_texts(model, [f"passage {i}" for i in range(100)], cache)
+    cache.save()
+    first = [name for name, _ in cache.segments]
+
+    cache = EmbeddingCache(path)
+    embed_texts(model, [f"passage {i}" for i in range(95, 105)], cache)
+    cache.save()
+    assert model.encoded == 105
+    assert [name for name, _ in cache.segments][:1] == first
+    assert [len(rows) for _, rows in cache.segments] == [100, 5]
+
+    reloaded = EmbeddingCache(path)
+    assert len(reloaded) == 105
+    assert np.array_equal(embed_texts(model, ["passage 3", "passage 104"], reloaded),
+                          FakeEncoder().encode(["passage 3", "passage 104"]))
+    assert model.encoded == 105
+
+def test_prune_compacts_to_the_live_vectors(tmp_path):
+    path = str(tmp_path / "cache.json")
+    model = CountingEncoder()
+    cache = EmbeddingCache(path)
+    for start in (0, 100, 150):
+        embed_texts(model, [f"passage {i}" for i in range(start, start + 50)], cache)
+        cache.save()
+    live = [f"passage {i}" for i in range(40, 160)]
+    cache.prune({content_hash(t) for t in live})
+    cache.save()
+
+    assert len(cache.segments) == 1
+    assert sorted(tmp_path.glob("cache-*.npy")) == [tmp_path / cache.segments[0][0]]
+    assert len(EmbeddingCache(path)) == 70  # 40-49, 100-149, 150-159
@@ -0,0 +1,17 @@
+# ✅ test_encoder.py – The Encoder Reports the Backend That Actually Loaded
+import sys
+import types
+import encoder
+from embeddings import encoder_id
+
+class SentenceTransformer:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+def test_missing_onnx_export_reports_torch(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=SentenceTransformer))
+    monkeypatch.setattr(encoder, "onnx_model_path", str(tmp_path / "missing.onnx"))
+    lazy = encoder.LazyEncoder("onnx", "all-MiniLM-L6-v2")
+
+    assert lazy.requested_backend == "onnx"
+    assert encoder_id(lazy) == "torch:all-MiniLM-L6-v2"
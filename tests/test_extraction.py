@@ -0,0 +1,30 @@
+# ✅ test_extraction.py – Sandboxed Extraction Workers
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_extracts_text_and_recycles_workers():
+    from extraction import ExtractionService
+    with ExtractionService(workers=2, recycle_after=1) as service:
+        futures = [service.submit(f"plain text {i}".encode(), ".txt") for i in range(5)]
+        assert [f.result(timeout=30) for f in futures] == [f"plain text {i}" for i in range(5)]
+
+def test_workers_do_not_rerun_the_server_script(tmp_path):
+    # The web app's module-level startup (index load, encoder warm-up) must run once, not once per worker
+    script = tmp_path / "server.py"
+    script.write_text(textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {REPO!r})
+        with open({str(tmp_path / "imports.log")!r}, "a") as f:
+            f.write(__name__ + "\\n")
+        from extraction import ExtractionService
+        if __name__ == "__main__":
+            with ExtractionService(workers=2, recycle_after=1) as service:
+                print([service.submit(b"some text", ".txt").result(timeout=30) for _ in range(4)])
+    """))
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+    assert "some text" in result.stdout, result.stderr
+    assert (tmp_path / "imports.log").read_text().split() == ["__main__"]
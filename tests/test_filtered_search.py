@@ -0,0 +1,47 @@
+# ✅ test_filtered_search.py – Filtered Queries Return k Hits on Approximate Indexes
+import numpy as np
+import pytest
+from index_factory import IndexBuilder
+from snapshot import Snapshot
+
+N, DIM, ALLOWED, K = 8000, 32, 30, 5
+
+class Meta:
+    def select(self, filters):
+        return np.arange(ALLOWED)  # doc ids 0..29
+
+class Passages:
+    def ids(self, doc_ids):
+        return np.asarray(doc_ids, dtype="int64") * 263  # spread across the corpus
+
+def snapshot(kind, pca_dim=0):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((N, DIM)).astype("float32")
+    builder = IndexBuilder(N, DIM, kind, pca_dim=pca_dim)
+    if builder.needs_training:
+        builder.train(vectors)
+    builder.add(vectors, np.arange(N))
+    index, params = builder.finish()
+    return Snapshot(1, index, params, [], None, Passages(), None, Meta()), vectors
+
+@pytest.mark.parametrize("kind, pca_dim", [("ivf", 0), ("ivfpq", 0), ("hnsw", 0), ("hnsw", 16)])
+def test_filtered_search_fills_k(kind, pca_dim):
+    snap, vectors = snapshot(kind, pca_dim)
+    filters = (("category", "PDFs"),)
+    queries = np.random.default_rng(1).standard_normal((20, DIM)).astype("float32")
+
+    index, params = snap.search_plan(None, None, filters)
+    D, I = index.search(queries, K, params=params)
+
+    allowed = np.arange(ALLOWED) * 263
+    assert (I >= 0).all()
+    assert np.isin(I, allowed).all()
+    if kind == "ivf" or (kind == "hnsw" and not pca_dim):
+        # exact over the allowed passages
+        exact = ((queries[:, None, :] - vectors[allowed][None]) ** 2).sum(-1).argsort(1)[:, :K]
+        assert (I == allowed[exact]).all()
+
+def test_unfiltered_plan_keeps_the_index_defaults():
+    snap, _ = snapshot("ivf")
+    index, params = snap.search_plan(None, None, None)
+    assert index is snap.index and params is None
@@ -0,0 +1,63 @@
+# ✅ test_index_factory.py – Index Kind by Corpus Size, Builds per Kind, Recall Figure
+import faiss
+import numpy as np
+import pytest
+import index_factory
+from index_factory import IndexBuilder, choose_kind, describe_index, index_ids, supports_removal
+
+DIM = 32
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+
+def build(kind, n=2000, **kwargs):
+    data = vectors(n)
+    builder = IndexBuilder(n, DIM, kind=kind, **kwargs)
+    if builder.needs_training:
+        builder.train(data[:builder.train_size(n)])
+    builder.track_recall(data[:50])
+    for start in range(0, n, 500):
+        builder.add(data[start:start + 500], np.arange(start, min(start + 500, n)) + 1000)
+    return data, builder.finish()
+
+def test_auto_kind_follows_corpus_size(monkeypatch):
+    monkeypatch.setattr(index_factory, "INDEX_IVF_THRESHOLD", 100)
+    monkeypatch.setattr(index_factory, "INDEX_PQ_THRESHOLD", 1000)
+    assert [choose_kind(n, "auto") for n in (99, 100, 999, 1000)] == ["flat", "ivf", "ivf", "ivfpq"]
+    assert choose_kind(10, "hnsw") == "hnsw"
+
+@pytest.mark.parametrize("kind", ["flat", "ivf", "ivfpq", "hnsw"])
+def test_each_kind_finds_its_own_vectors_under_their_ids(kind):
+    data, (index, params) = build(kind)
+    assert params["kind"] == kind and describe_index(index)["kind"] == kind
+    assert index.ntotal == len(data)
+
+    _, I = index.search(data[:20], 1)
+    hits = (I[:, 0] == np.arange(20) + 1000).mean()
+    assert hits >= (0.9 if kind == "ivfpq" else 1.0)
+    if supports_removal(params):
+        assert sorted(index_ids(index).tolist()) == list(range(1000, 1000 + len(data)))
+
+def test_only_lossy_indexes_carry_a_recall_figure():
+    _, (_, flat) = build("flat")
+    assert "recall" not in flat
+
+    _, (_, ivf) = build("ivf")
+    assert ivf["recall"]["k"] == index_factory.RECALL_K and ivf["recall"]["queries"] == 50
+    assert 0.5 < ivf["recall"]["recall"] <= 1.0
+
+    _, (_, fp16) = build("flat", storage="float16")
+    assert fp16["recall"]["recall"] > 0.9
+
+def test_hnsw_cannot_remove():
+    _, (_, params) = build("hnsw", n=200)
+    assert not supports_removal(params) and supports_removal({"kind": "ivf"})
+
+def test_rebuild_reports_recall_for_the_configured_kind(shared, monkeypatch):
+    monkeypatch.setattr(index_factory, "INDEX_KIND", "hnsw")
+    shared.upsert_documents({f"doc{i}.txt": f"topic{i} notes " * 40 for i in range(30)})
+    shared.rebuild_faiss()
+
+    assert shared.index_params["kind"] == "hnsw"
+    assert "recall@" in shared.processing_status["stage"]
+    assert isinstance(faiss.downcast_index(shared.index.index), faiss.IndexHNSWFlat)
@@ -0,0 +1,55 @@
+# ✅ test_index_format.py – Format 2 Header, Format 1 Migration, float16 / PCA Storage + Transform Reuse
+import json
+import os
+import faiss
+import index_factory
+from index_factory import INDEX_FORMAT, describe_index, read_header, write_index_file
+
+def corpus(n=40):
+    return {f"doc{i}.txt": f"topic{i} notes about item{i % 7} " * 30 for i in range(n)}
+
+def test_header_round_trips_and_bare_files_have_none(tmp_path):
+    index = faiss.IndexFlatL2(8)
+    path = str(tmp_path / "index.faiss")
+    write_index_file(index, {"kind": "flat", "dim": 8}, path)
+    assert read_header(path) == {"kind": "flat", "dim": 8, "format": INDEX_FORMAT}
+    assert faiss.read_index(path).d == 8  # the trailer doesn't disturb faiss readers
+
+    faiss.write_index(index, path)
+    assert read_header(path) is None
+
+def test_format_1_index_is_migrated_in_place(shared):
+    shared.upsert_documents(corpus(5))
+    faiss.write_index(shared.index, shared.index_path)
+    with open(index_factory.index_params_path, "w") as f:
+        json.dump({"kind": "flat", "dim": 32, "built_by": "format 1"}, f)
+    shared.index = None
+
+    assert shared.load_index() is not None
+    assert read_header(shared.index_path)["built_by"] == "format 1"
+    assert read_header(shared.index_path)["format"] == INDEX_FORMAT
+    assert not os.path.exists(index_factory.index_params_path)
+    assert shared.index_params["built_by"] == "format 1"
+
+def test_float16_storage_is_recorded_and_detected(shared, monkeypatch):
+    monkeypatch.setattr(index_factory, "INDEX_STORAGE", "float16")
+    shared.upsert_documents(corpus(5))
+    shared.rebuild_faiss()
+    assert shared.index_params["storage"] == "float16"
+    assert describe_index(faiss.read_index(shared.index_path))["storage"] == "float16"
+
+def test_pca_transform_is_trained_once_and_reused(shared, monkeypatch):
+    monkeypatch.setattr(index_factory, "INDEX_PCA_DIM", 16)
+    shared.upsert_documents(corpus())
+    shared.rebuild_faiss()
+    assert shared.index_params["pca_dim"] == 16 and shared.index_params["transform"]["version"] == 1
+    saved = os.stat(index_factory.index_transform_path).st_ino
+
+    shared.upsert_documents({"extra.txt": "fresh notes " * 30})
+    shared.rebuild_faiss()
+    assert shared.index_params["transform"]["version"] == 1
+    assert os.stat(index_factory.index_transform_path).st_ino == saved  # not retrained or rewritten
+
+    monkeypatch.setattr(index_factory, "INDEX_PCA_DIM", 8)
+    shared.rebuild_faiss()
+    assert shared.index_params["pca_dim"] == 8 and shared.index_params["transform"]["version"] == 2
@@ -0,0 +1,64 @@
+# ✅ test_ingest_job.py – Checkpointed Drive Runs: Crash, Resume, Single-Flight
+import json
+import threading
+import ingest_job
+from ingest_job import IngestJob, JobScheduler
+
+class Killed(Exception):
+    pass
+
+def crash_after(n):
+    class CrashingJob(IngestJob):
+        def advance(self, size=0):
+            super().advance(size)
+            if self.state["done"] == n:
+                raise Killed(f"killed after file {n}")
+    return CrashingJob
+
+def job_state():
+    with open(ingest_job.ingest_job_path) as f:
+        return json.load(f)
+
+def test_crashed_run_resumes_without_losing_files(shared, drive, monkeypatch):
+    import sort_drive
+    monkeypatch.setattr(ingest_job, "CHECKPOINT_FILES", 5)
+    for i in range(20):
+        drive.add_file(f"doc{i:02d}.txt", (f"document number {i} " * 20).encode())
+
+    monkeypatch.setattr(sort_drive, "IngestJob", crash_after(13))
+    sort_drive.run_drive_processing(full=True)
+
+    assert job_state()["status"] == "failed"
+    assert len(shared.knowledge_base) == 10  # two checkpoints committed
+    loose = [i["name"] for i in drive.items.values() if "root" in i["parents"] and i["mimeType"] == "text/plain"]
+    assert len(loose) == 10  # nothing after the last checkpoint was moved out of root
+
+    monkeypatch.setattr(sort_drive, "IngestJob", IngestJob)
+    sort_drive.run_drive_processing()
+
+    state = job_state()
+    assert state["status"] == "done" and state["resumes"] == 1
+    assert shared.processing_status["log"]["count"] == 10
+    assert len(shared.knowledge_base) == 20
+
+def test_auth_failure_is_not_resumed(shared, drive, monkeypatch):
+    import sort_drive
+    monkeypatch.setattr(sort_drive, "authenticate_drive", lambda: None)
+    sort_drive.run_drive_processing()
+    assert job_state()["status"] == "aborted"
+
+    assert IngestJob().begin() is False
+
+def test_scheduler_is_single_flight(workdir):
+    release, started = threading.Event(), []
+    scheduler = JobScheduler(lambda **kwargs: (started.append(kwargs), release.wait(5)))
+
+    assert scheduler.submit(full=True)
+    assert not scheduler.submit()
+    assert not JobScheduler(lambda: None).submit()  # another worker: the flock is held
+    release.set()
+    scheduler._thread.join(5)
+
+    assert started == [{"full": True}]
+    assert scheduler.submit()
+    scheduler._thread.join(5)
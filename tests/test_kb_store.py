@@ -0,0 +1,54 @@
+# ✅ test_kb_store.py – Doc Table + Append-Only Text Blob (Replace, Remove, Compact)
+import os
+from doc_table import DocTable
+from kb_store import KnowledgeStore
+
+def store(tmp_path):
+    table = DocTable(str(tmp_path / "doc_table.npy"))
+    return KnowledgeStore(table, str(tmp_path / "kb_text.bin"))
+
+def test_update_replace_and_remove(tmp_path):
+    kb = store(tmp_path)
+    kb.update({"a.txt": "alpha text", "b.pdf": "bravo text", "blank.txt": "   "})
+    assert sorted(kb) == ["a.txt", "b.pdf"]
+    first_id = kb.table.get_id("a.txt")
+
+    kb["a.txt"] = "alpha replaced"
+    assert kb["a.txt"] == "alpha replaced"
+    assert kb.table.get_id("a.txt") == first_id
+
+    del kb["b.pdf"]
+    assert "b.pdf" not in kb and len(kb) == 1
+
+def test_reload_from_disk(tmp_path):
+    kb = store(tmp_path)
+    kb.update({"a.txt": "alpha text ü", "b.txt": "bravo"})
+    reloaded = store(tmp_path)
+    assert reloaded["a.txt"] == "alpha text ü"
+    assert reloaded.table.lookup([reloaded.table.get_id("b.txt")])[0]["ext"] == ".txt"
+
+def test_compact_drops_garbage_and_keeps_ids(tmp_path):
+    kb = store(tmp_path)
+    kb.update({f"doc{i}.txt": f"document {i} " * 50 for i in range(10)})
+    ids = {name: kb.table.get_id(name) for name in kb}
+    kb.remove([f"doc{i}.txt" for i in range(8)])
+    before = os.path.getsize(kb.path)
+
+    kb.compact()
+
+    assert os.path.getsize(kb.path) < before / 2
+    assert kb["doc9.txt"] == "document 9 " * 50
+    assert {name: kb.table.get_id(name) for name in kb} == {n: ids[n] for n in ("doc8.txt", "doc9.txt")}
+    assert store(tmp_path)["doc8.txt"] == "document 8 " * 50
+
+def test_pinned_reader_survives_compact(tmp_path):
+    kb = store(tmp_path)
+    kb.update({f"doc{i}.txt": f"document {i} " * 50 for i in range(10)})
+    view = KnowledgeStore(DocTable(kb.table.path), kb.path)
+    view.pin()
+    kb.remove([f"doc{i}.txt" for i in range(9)])
+    kb.compact()
+
+    assert view["doc3.txt"] == "document 3 " * 50
+    assert "doc3.txt" not in kb
+    view.close()
@@ -0,0 +1,42 @@
+# ✅ test_lexical.py – BM25 Postings Updates
+from lexical import LexicalIndex
+
+def ranked(index, query):
+    return [doc_id for doc_id, _ in index.search(query, k=10)]
+
+def test_update_adds_replaces_and_removes(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.npz"))
+    index.update({0: "warranty terms for the TGI-500", 1: "shipping times and rates", 2: "warranty claims form"})
+    assert len(index) == 3
+    assert set(ranked(index, "warranty")) == {0, 2}
+    assert ranked(index, "TGI") == [0]
+
+    index.update({0: "pricing tiers"})  # replacing a doc drops its old terms
+    assert ranked(index, "warranty") == [2]
+    assert ranked(index, "pricing") == [0]
+
+    index.update(removed=[2])
+    assert ranked(index, "warranty") == []
+    assert sorted(index.doc_ids().tolist()) == [0, 1]
+
+def test_reader_keeps_its_postings_generation(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.npz"))
+    index.update({0: "warranty terms"})
+    index.save()
+    pinned = LexicalIndex(index.path)
+    assert ranked(pinned, "warranty") == [0]
+    index.update({1: "warranty claims"})
+    index.save()
+
+    assert ranked(pinned, "warranty") == [0]
+    assert set(ranked(index, "warranty")) == {0, 1}
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "lexical.npz")
+    index = LexicalIndex(path)
+    index.update({3: "pricing tiers", 5: "shipping rates"})
+    index.save()
+
+    reloaded = LexicalIndex(path)
+    assert ranked(reloaded, "shipping") == [5]
+    assert len(reloaded) == 2
@@ -0,0 +1,40 @@
+# ✅ test_metrics.py – Exposition Format + the /metrics Endpoint
+import metrics
+from metrics import Counter, Histogram
+
+def test_histogram_buckets_are_cumulative(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+    hist = Histogram("test_seconds", "Test latency", ("ext",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        hist.observe(value, ext=".pdf")
+
+    lines = metrics.render().splitlines()
+    assert lines[:2] == ["# HELP test_seconds Test latency", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{ext=".pdf",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{ext=".pdf",le="1"} 3' in lines
+    assert 'test_seconds_bucket{ext=".pdf",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{ext=".pdf"} 4' in lines
+
+def test_counter_labels_are_escaped(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+    calls = Counter("test_calls_total", "Test calls", ("op",))
+    calls.inc(op='files "list"')
+    calls.inc(2, op='files "list"')
+    assert 'test_calls_total{op="files \\"list\\""} 3' in metrics.render().splitlines()
+
+def test_metrics_endpoint_reports_query_stages_and_index_gauges(shared):
+    import search_faiss
+    shared.upsert_documents({"pricing.txt": "pricing tiers " * 40})
+    shared.upsert_documents({"warranty.pdf": "warranty returns " * 40})  # incremental: timed per file
+    client = search_faiss.app.test_client()
+    assert client.get("/query", query_string={"question": "pricing tiers"}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    for name in ("salesbot_query_encode_seconds_bucket", "salesbot_index_search_seconds_count",
+                 'salesbot_file_embed_seconds_count{ext=".pdf"}', "salesbot_rss_bytes"):
+        assert name in body
+    assert 'salesbot_request_seconds_count{endpoint="query",method="GET",status="200"}' in body
+    assert f"salesbot_index_vectors {shared.snapshots.current.index.ntotal}" in body.splitlines()
+    assert "salesbot_index_documents 2" in body.splitlines()
@@ -0,0 +1,24 @@
+# ✅ test_passages.py – Passage Chunker Byte Offsets
+from passages import iter_passages
+
+def test_offsets_slice_the_utf8_bytes_of_the_doc():
+    text = " ".join(f"wörd{i} naïve café €{i}" for i in range(300))
+    data = text.encode("utf-8")
+    passages = list(iter_passages(text, size=120, overlap=30))
+
+    assert len(passages) > 5
+    for offset, length, chunk in passages:
+        assert data[offset:offset + length].decode("utf-8") == chunk
+
+def test_passages_overlap_and_cover_the_whole_doc():
+    text = " ".join(f"token{i}" for i in range(500))
+    passages = list(iter_passages(text, size=100, overlap=20))
+
+    for (a_off, a_len, _), (b_off, _, _) in zip(passages, passages[1:]):
+        assert a_off < b_off <= a_off + a_len
+    last_off, last_len, _ = passages[-1]
+    assert passages[0][0] == 0 and last_off + last_len == len(text.encode("utf-8"))
+
+def test_blank_and_short_texts():
+    assert list(iter_passages("   ", size=100)) == []
+    assert list(iter_passages("short doc", size=100)) == [(0, 9, "short doc")]
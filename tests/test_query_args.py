@@ -0,0 +1,49 @@
+# ✅ test_query_args.py – /search and /query Reject Bad Parameters with a 400
+import pytest
+
+@pytest.fixture
+def client(shared):
+    import app
+    return app.app.test_client()
+
+@pytest.mark.parametrize("args", [
+    "mode=bogus", "scoring=avg", "nprobe=-3", "ef_search=0", "nprobe=many",
+])
+def test_search_rejects_bad_parameters(client, args):
+    response = client.get(f"/search?query=pricing&{args}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+def test_search_accepts_valid_parameters(client):
+    response = client.get("/search?query=pricing&mode=lexical&scoring=sum&nprobe=4&ef_search=32")
+    assert response.status_code == 200
+
+def test_search_options_are_positive_ints():
+    import query_args
+    assert query_args.search_options({}) is None
+    assert query_args.search_options({"nprobe": "8"}) == (8, None)
+    with pytest.raises(ValueError):
+        query_args.search_options({"ef_search": "-1"})
+
+@pytest.mark.parametrize("item", [
+    {"question": "pricing", "file_type": 5},
+    {"question": "pricing", "category": ["PDFs"]},
+    {"question": "pricing", "modified_after": {"year": 2024}},
+])
+def test_batch_rejects_non_string_filters(shared, item):
+    import search_faiss
+    response = search_faiss.app.test_client().post("/query/batch", json=[item])
+    assert response.status_code == 400
+    assert "must be a string" in response.get_json()["error"]
+
+@pytest.mark.parametrize("args", ["modified_after=garbage", "modified_before=31/01/2024"])
+def test_search_rejects_unparseable_dates(client, args):
+    response = client.get(f"/search?query=pricing&{args}")
+    assert response.status_code == 400
+    assert "ISO 8601" in response.get_json()["error"]
+
+def test_dates_are_validated_for_every_endpoint(shared):
+    import query_args
+    assert query_args.filters({"modified_after": "2024-01-31T00:00:00Z"}) == (("modified_after", "2024-01-31T00:00:00Z"),)
+    with pytest.raises(ValueError):
+        query_args.filters({"modified_before": "last week"})
@@ -0,0 +1,54 @@
+# ✅ test_query_batch.py – POST /query/batch: Input Order, Per-Question top_k, NDJSON Streaming
+import json
+import pytest
+
+def text(*words):
+    return (" ".join(words) + " ") * 20
+
+DOCS = {
+    "pricing.txt": text("pricing", "tiers", "discount"),
+    "onboarding.txt": text("onboarding", "steps", "welcome"),
+    "warranty.pdf": text("warranty", "returns", "repair"),
+}
+
+@pytest.fixture
+def client(shared):
+    import search_faiss
+    shared.upsert_documents(DOCS)
+    return search_faiss.app.test_client(), search_faiss
+
+QUESTIONS = [
+    {"question": "warranty returns", "top_k": 1},
+    "pricing tiers",
+    {"question": "onboarding steps", "top_k": 2, "file_type": ".txt"},
+]
+
+def test_answers_come_back_in_input_order(client):
+    client, _ = client
+    answers = client.post("/query/batch", json=QUESTIONS).get_json()
+
+    assert [a["question"] for a in answers] == ["warranty returns", "pricing tiers", "onboarding steps"]
+    assert [a["results"][0]["source"] for a in answers] == ["warranty.pdf", "pricing.txt", "onboarding.txt"]
+    assert len(answers[0]["results"]) == 1 and len(answers[2]["results"]) == 2
+    assert all(r["file_type"] == ".txt" for r in answers[2]["results"])
+
+def test_large_batches_stream_ndjson_in_order(client, monkeypatch):
+    client, server = client
+    monkeypatch.setattr(server, "QUERY_BATCH_STREAM_THRESHOLD", 2)
+    response = client.post("/query/batch", json={"questions": QUESTIONS})
+
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["results"][0]["source"] for line in lines] == ["warranty.pdf", "pricing.txt", "onboarding.txt"]
+
+def test_accept_header_asks_for_a_stream(client):
+    client, _ = client
+    response = client.post("/query/batch", json=["pricing tiers"], headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    assert json.loads(response.get_data(as_text=True))["index"] == 0
+
+@pytest.mark.parametrize("payload", [[], {"questions": "pricing"}, [{"question": " "}], [{"question": "x", "top_k": 0}]])
+def test_malformed_batches_are_rejected(client, payload):
+    client, _ = client
+    assert client.post("/query/batch", json=payload).status_code == 400
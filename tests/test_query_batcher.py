@@ -0,0 +1,51 @@
+# ✅ test_query_batcher.py – Coalesced Encode + Search, Per-Question Rows
+import faiss
+import numpy as np
+import pytest
+from query_batcher import QueryBatcher
+
+DIM = 8
+
+def flat_index():
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.eye(DIM, dtype="float32"))
+    return index
+
+class Encoder:
+    # Question "q3" → unit vector 3, so its nearest row is id 3
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, questions):
+        self.calls.append(list(questions))
+        return np.eye(DIM, dtype="float32")[[int(q[1:]) for q in questions]]
+
+def test_concurrent_questions_share_one_encode_and_keep_their_rows():
+    encode, index = Encoder(), flat_index()
+    batcher = QueryBatcher(encode, lambda source: index, window_ms=200, max_batch=8)
+    futures = [batcher.submit(f"q{i}", k) for i, k in ((5, 1), (2, 3), (7, 2))]
+    results = [f.result(timeout=5) for f in futures]
+
+    assert len(encode.calls) == 1 and sorted(encode.calls[0]) == ["q2", "q5", "q7"]
+    assert [I[0] for _, I in results] == [5, 2, 7]
+    assert [len(I) for _, I in results] == [1, 3, 2]
+
+def test_different_search_options_are_searched_apart():
+    encode, index = Encoder(), flat_index()
+    planned = []
+
+    def plan(source, options):
+        planned.append(options)
+        return index, None
+
+    batcher = QueryBatcher(encode, lambda source: index, window_ms=200, max_batch=8, plan=plan)
+    futures = [batcher.submit("q1", 1), batcher.submit("q2", 1, options=(4, None)), batcher.submit("q3", 1)]
+    assert [f.result(timeout=5)[1][0] for f in futures] == [1, 2, 3]
+    assert len(encode.calls) == 2 and planned == [(4, None)]
+
+def test_missing_index_fails_every_waiting_question():
+    batcher = QueryBatcher(Encoder(), lambda source: None, window_ms=50)
+    futures = [batcher.submit("q1", 1), batcher.submit("q2", 1)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
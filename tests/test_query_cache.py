@@ -0,0 +1,44 @@
+# ✅ test_query_cache.py – Embedding + Result Caches, Index-Version Invalidation
+import numpy as np
+from query_cache import LRUCache, QueryCache
+
+def test_embeddings_are_encoded_once_per_normalized_question():
+    cache, seen = QueryCache(), []
+
+    def encode(questions):
+        seen.extend(questions)
+        return np.ones((len(questions), 4), dtype="float32")
+
+    encode_with_cache = cache.cached_encoder(encode)
+    encode_with_cache(["Return policy?"])
+    vectors = encode_with_cache(["  return   POLICY? ", "pricing"])
+
+    assert seen == ["Return policy?", "pricing"]
+    assert vectors.shape == (2, 4)
+
+def test_version_bump_drops_stored_results():
+    cache = QueryCache()
+    cache.put_result("Return policy?", 5, None, 1, {"answer": "30 days"})
+    assert cache.get_result("return policy?", 5, None, 1) == {"answer": "30 days"}
+    assert cache.get_result("return policy?", 3, None, 1) is None
+
+    assert cache.get_result("return policy?", 5, None, 2) is None
+    assert cache.stats()["result"]["size"] == 0 and cache.version == 2
+
+def test_query_on_an_older_snapshot_misses_without_flushing():
+    cache = QueryCache()
+    cache.put_result("pricing", 5, None, 2, {"answer": "tiers"})
+    assert cache.get_result("pricing", 5, None, 1) is None
+    assert cache.get_result("pricing", 5, None, 2) == {"answer": "tiers"}
+
+def test_lru_evicts_oldest_and_expires_entries():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    expired = LRUCache(ttl=-1)
+    expired.put("a", 1)
+    assert expired.get("a") is None
@@ -0,0 +1,68 @@
+# ✅ test_serving.py – Generation Reload, Readiness and Worker-Independent Status Endpoints
+import importlib.util
+import os
+import pytest
+from conftest import FakeEncoder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def text(*words):
+    return (" ".join(words) + " ") * 20
+
+@pytest.fixture
+def server(shared):
+    import search_faiss
+    return search_faiss
+
+def test_status_endpoints_read_the_published_generation(server, shared, monkeypatch):
+    shared.upsert_documents({"pricing.txt": text("pricing", "tiers"), "onboarding.txt": text("onboarding", "steps")})
+    # A worker that never wrote still holds the knowledge base it loaded at import
+    monkeypatch.setattr(server, "knowledge_base", {})
+    client = server.app.test_client()
+
+    assert sorted(client.get("/files").get_json()["files"]) == ["onboarding.txt", "pricing.txt"]
+    assert client.get("/").get_json()["sorted_files"] == 2
+    assert client.get("/debug").get_json()["indexed_files"] == 2
+    assert client.post("/reload_index").status_code == 200
+
+def load_worker(name="other_worker"):
+    # A second copy of shared: its own writer state and snapshots over the same working directory
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "shared.py"))
+    worker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(worker)
+    worker.model = FakeEncoder()
+    return worker
+
+def test_worker_reloads_a_generation_published_elsewhere(server, shared):
+    shared.upsert_documents({"pricing.txt": text("pricing", "tiers")})
+    first = shared.snapshots.current
+
+    other = load_worker()
+    other.upsert_documents({"warranty.pdf": text("warranty", "returns")})
+    assert other.index_version == first.version + 1
+
+    shared.refresh_snapshot(force=True)
+    current = shared.snapshots.current
+    assert current.version == other.index_version and first.closed
+    assert sorted(current.docs.ids) == ["pricing.txt", "warranty.pdf"]
+    answers = server.app.test_client().post("/query/batch", json=["warranty returns"]).get_json()
+    assert answers[0]["results"][0]["source"] == "warranty.pdf"
+
+    # This worker's next write starts from what the other one left on disk
+    shared.upsert_documents({"onboarding.txt": text("onboarding", "steps")})
+    assert sorted(shared.snapshots.current.docs.ids) == ["onboarding.txt", "pricing.txt", "warranty.pdf"]
+
+def test_ready_waits_for_a_snapshot_and_the_encoder(server, shared):
+    client = server.app.test_client()
+    response = client.get("/ready")
+    assert response.status_code == 503 and response.get_json()["index"] is False
+    assert client.get("/health").status_code == 200
+
+    shared.upsert_documents({"pricing.txt": text("pricing", "tiers")})
+    assert client.get("/ready").status_code == 503  # encoder not warmed yet
+
+    shared.warm_up_encoder()
+    response = client.get("/ready")
+    body = response.get_json()
+    assert response.status_code == 200 and body["generation"] == shared.index_version
+    assert body["startup_s"]["ready_s"] is not None
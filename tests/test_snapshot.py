@@ -0,0 +1,71 @@
+# ✅ test_snapshot.py – Snapshot Reference Counting + Atomic Swap
+import faiss
+from snapshot import Snapshot, SnapshotManager
+
+class Texts:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def snapshot(version):
+    return Snapshot(version, object(), {}, [], Texts(), object(), object(), object())
+
+def test_replaced_snapshot_closes_after_its_last_reader():
+    manager = SnapshotManager()
+    first = snapshot(1)
+    assert manager.publish(first)
+
+    reader = manager.acquire()
+    assert reader is first
+    assert manager.publish(snapshot(2))
+    assert not first.closed and first.index is not None
+    assert manager.stats() == {"version": 2, "retired_in_use": [1]}
+
+    reader.release()
+    assert first.closed and first.texts.closed and first.index is None
+    assert first.docs is first.passages is first.lexical is first.meta is None
+    assert manager.stats() == {"version": 2, "retired_in_use": []}
+
+def test_replaced_snapshot_without_readers_closes_at_once():
+    manager = SnapshotManager()
+    first = snapshot(1)
+    manager.publish(first)
+    manager.publish(snapshot(2))
+    assert first.closed
+
+def test_stale_publish_is_dropped():
+    manager = SnapshotManager()
+    manager.publish(snapshot(3))
+    stale = snapshot(2)
+
+    assert not manager.publish(stale)
+    assert stale.closed
+    assert manager.current.version == 3
+
+def test_reading_pins_and_releases():
+    manager = SnapshotManager()
+    with manager.reading() as empty:
+        assert empty is None
+    first = snapshot(1)
+    manager.publish(first)
+    with manager.reading() as pinned:
+        manager.publish(snapshot(2))
+        assert pinned is first and not first.closed
+    assert first.closed
+
+def test_writer_serves_the_generation_from_disk_and_keeps_its_index(shared, monkeypatch):
+    shared.upsert_documents({"a.txt": "warranty terms for returns", "b.txt": "pricing tiers"})
+    first = shared.snapshots.current
+    assert first.index is not shared.index
+    assert first.docs is not shared.doc_table and first.passages is not shared.passage_store
+
+    def clone_index(index):
+        raise AssertionError("the writer index is private; nothing should copy it")
+    monkeypatch.setattr(faiss, "clone_index", clone_index)
+    shared.upsert_documents({"c.txt": "shipping rates by region"})
+
+    second = shared.snapshots.current
+    assert first.closed and first.docs is None
+    assert sorted(second.docs.ids) == ["a.txt", "b.txt", "c.txt"]
+    assert second.index.ntotal == shared.index.ntotal